@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Batch post-processing of finished sessions.  A chain of per-frame
+#-- operations, given with -c, runs over every frame of the D####
+#-- directories named, spread over a pool of processes.  Results land
+#-- in a subdirectory of each session and, with -v, are fed in order
+#-- into one video.  Frames whose output is newer than the frame and
+#-- was made by the same chain are not redone, so an interrupted run
+#-- picks up where it stopped.
+#--
+#-- Operations, comma separated, applied left to right:
+#--   resize=WxH          scale to W by H
+#--   rotate=DEG          rotate counter-clockwise
+#--   clock=GRAV[:SIZE]   clockface.py clock in corner nw, ne, sw or se
+#--   quality=Q           JPEG quality of the output (default 90)
+
+import os, re, sys, time, glob, getopt, multiprocessing
+
+try :
+    from PIL import Image
+except ImportError :
+    Image = None
+
+from clockface import clockface
+from videncoder import videncoder
+from pilapse import ENCODER
+
+CHAINFILE = ".chain"    # the chain the outputs in a directory were made by
+
+# --
+
+def parse_chain (text) :
+
+    # -- [(op, args)], raising ValueError for anything not understood
+
+    chain = []
+    for step in [s for s in text.split(',') if s] :
+        op, _, arg = step.partition('=')
+        if op == 'resize' :
+            w, h = arg.lower().split('x')
+            chain.append((op, (int(w), int(h))))
+        elif op == 'rotate' :
+            chain.append((op, float(arg)))
+        elif op == 'clock' :
+            grav, _, size = arg.partition(':')
+            if grav.lower() not in clockface.GRAVITIES :
+                raise ValueError("invalid gravity %s" % grav)
+            chain.append((op, (grav.lower(), int(size or 50))))
+        elif op == 'quality' :
+            chain.append((op, int(arg)))
+        else :
+            raise ValueError("unknown operation %s" % op)
+    return chain
+
+# --
+
+clocks = {}     # one clockface per process and setting; sprites are cached
+
+def frame_time (path) :
+
+    # -- hour and minute from the file name, as clockface.pl finds them
+
+    stamp = re.search(r'T(\d\d)(\d\d)(\d\d)\D', os.path.basename(path))
+    if stamp is None :
+        return None
+    return int(stamp.group(1)), int(stamp.group(2))
+
+def work (task) :
+
+    # -- run in a pool process: apply the chain to one frame
+
+    src, dst, chain = task
+    t0 = time.time()
+    im = Image.open(src)
+    quality = 90
+    for op, arg in chain :
+        if op == 'resize' :
+            im = im.resize(arg, Image.LANCZOS)
+        elif op == 'rotate' :
+            im = im.rotate(arg, expand=True)
+        elif op == 'clock' :
+            hm = frame_time(src)
+            if hm is not None :
+                if arg not in clocks :
+                    clocks[arg] = clockface(arg[1], '#ffffff', arg[0])
+                clocks[arg].blend(im, hm[0], hm[1])
+        elif op == 'quality' :
+            quality = arg
+    tmp = dst + ".tmp"
+    im.save(tmp, 'JPEG', quality=quality)
+    os.rename(tmp, dst)
+    return dst, time.time() - t0
+
+# --
+
+def up_to_date (src, dst) :
+
+    try :
+        return os.path.getmtime(dst) >= os.path.getmtime(src)
+    except OSError :
+        return False
+
+def plan (dirs, outname, chain, spec) :
+
+    # -- (src, dst, todo) for every frame of every directory, in order.
+    # -- A directory made by another chain loses its marker here, so its
+    # -- outputs stay suspect until mark() is reached after a full run
+
+    frames = []
+    for d in dirs :
+        outdir = os.path.join(d, outname)
+        if not os.path.isdir(outdir) :
+            os.makedirs(outdir)
+        marker = os.path.join(outdir, CHAINFILE)
+        try :
+            fh = open(marker)
+            same = fh.read().strip() == spec
+            fh.close()
+        except IOError :
+            same = False
+        if not same and os.path.exists(marker) :
+            os.unlink(marker)
+        for src in sorted(glob.glob(os.path.join(d, "*.jpg"))) :
+            dst = os.path.join(outdir, os.path.basename(src))
+            frames.append((src, dst, not (same and up_to_date(src, dst))))
+    return frames
+
+def mark (dirs, outname, spec) :
+
+    # -- every output of dirs is now made by spec
+
+    for d in dirs :
+        fh = open(os.path.join(d, outname, CHAINFILE), 'w')
+        fh.write(spec + "\n")
+        fh.close()
+
+# --
+
+def run (dirs, chain, spec, outname="post", jobs=None, vidpath=None, fps=24, command=ENCODER) :
+
+    jobs = jobs or multiprocessing.cpu_count()
+    frames = plan(dirs, outname, chain, spec)
+    tasks = [(src, dst, chain) for src, dst, todo in frames if todo]
+    encoder = None
+    if vidpath :
+        encoder = videncoder(command, vidpath, fps)
+
+    t0 = time.time()
+    busy = 0.0
+    pool = multiprocessing.Pool(jobs)
+    try :
+        results = pool.imap(work, tasks, 4)
+        for src, dst, todo in frames :
+            if todo :
+                done, dt = next(results)
+                busy += dt
+            if encoder is not None :
+                fh = open(dst, 'rb')
+                encoder.feed(fh.read())
+                fh.close()
+        pool.close()
+    except :
+        pool.terminate()
+        raise
+    finally :
+        pool.join()
+    mark(dirs, outname, spec)
+    if encoder is not None :
+        encoder.finish(True)
+    wall = max(1e-6, time.time() - t0)
+
+    n = len(tasks)
+    sys.stderr.write("%d frames, %d up to date, in %0.1fs on %d cores: %0.2f fps, %0.2f fps per core\n"
+        % (n, len(frames) - n, wall, jobs, n / wall, n / max(1e-6, busy)))
+    if encoder is not None :
+        sys.stderr.write("encoder %s\n" % encoder.stats())
+    return n
+
+# --
+
+def usage (msg=None) :
+    if msg :
+        sys.stderr.write("%s\n" % msg)
+    sys.stderr.write("Usage: %s -c chain [-j jobs] [-o outdir-name] [-v video.mp4 [-r fps] [-e encoder]] D#### [D#### ...]\n" % sys.argv[0])
+    sys.stderr.write("    chain is e.g. resize=1280x720,clock=se:60,quality=85\n")
+    sys.exit(1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    spec = None
+    jobs = None
+    outname = "post"
+    vidpath = None
+    fps = 24
+    command = ENCODER
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "c:j:o:v:r:e:")
+    except getopt.GetoptError :
+        usage()
+    for o, a in opts :
+        if o == '-c' :
+            spec = a
+        elif o == '-j' :
+            jobs = int(a)
+        elif o == '-o' :
+            outname = a
+        elif o == '-v' :
+            vidpath = a
+        elif o == '-r' :
+            fps = int(a)
+        elif o == '-e' :
+            command = a
+    if spec is None or not args :
+        usage()
+    if Image is None :
+        usage("batchpost needs PIL")
+    try :
+        chain = parse_chain(spec)
+    except ValueError as e :
+        usage(str(e))
+    for d in args :
+        if not os.path.isdir(d) :
+            usage("%s: No such directory" % d)
+
+    try :
+        run(args, chain, spec, outname, jobs, vidpath, fps, command)
+    except KeyboardInterrupt :
+        sys.exit(1)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Compare per-frame capture latency of the old reopen-every-frame path
+#-- against one capsession held for the whole recording.  Uses fakecamera
+#-- so it runs anywhere; pass -r to time the real camera on a Pi.
+
+import sys, time, getopt
+
+from capsession import capsession
+from fakecamera import fakecamera
+
+# --
+
+def old_path (factory, frames, resolution, iso) :
+
+    # -- what the main loop did up to 1.22: close, reopen, reapply
+
+    lat = []
+    camera = factory ()
+    camera.resolution = resolution
+    camera.rotation = 270
+    if iso != 0 :
+        camera.iso = iso
+    shutter = 0
+    gain = None
+    for framecount in range (0, frames) :
+        t0 = time.time ()
+        if framecount == 1 and iso != 0 :
+            shutter = camera.exposure_speed
+            camera.exposure_mode = 'off'
+            camera.shutter_speed = shutter
+            gain = camera.awb_gains
+            camera.awb_mode = 'off'
+            camera.awb_gains = gain
+        camera.capture (NullSink ())
+        camera.close ()
+        camera = factory ()
+        camera.resolution = resolution
+        camera.rotation = 270
+        if iso != 0 :
+            camera.exposure_mode = 'off'
+            camera.awb_mode = 'off'
+            camera.iso = iso
+            camera.shutter_speed = shutter
+            camera.awb_gains = gain
+        lat.append (time.time () - t0)
+    camera.close ()
+    return lat
+
+# --
+
+def new_path (factory, frames, resolution, iso) :
+
+    lat = []
+    sess = capsession (factory)
+    sess.start (resolution, 270, iso)
+    for framecount in range (0, frames) :
+        t0 = time.time ()
+        if framecount == 1 and iso != 0 :
+            sess.lock ()
+        sess.capture (NullSink ())
+        lat.append (time.time () - t0)
+    sess.stop ()
+    return lat
+
+# --
+
+class NullSink :
+
+    def write (self, data) :
+        return len (data)
+
+# --
+
+def report (name, lat) :
+
+    lat = sorted (lat)
+    n = len (lat)
+    mean = sum (lat) / n
+    sys.stdout.write ("%-8s %5d frames  mean %7.1f ms  p50 %7.1f ms  p95 %7.1f ms  max %7.1f ms\n"
+        % (name, n, mean * 1000, lat[n // 2] * 1000,
+           lat[min (n - 1, int (n * 0.95))] * 1000, lat[-1] * 1000) )
+    return mean
+
+# --
+
+def usage () :
+    sys.stderr.write ("Usage: %s [-n frames] [-s WxH] [-i iso] [-r]\n" % sys.argv[0])
+    sys.stderr.write ("    -r times the real PiCamera instead of fakecamera\n")
+    sys.exit (1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    frames = 20
+    resolution = '1280x720'
+    iso = 100
+    factory = fakecamera
+
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "n:s:i:r")
+    except getopt.GetoptError :
+        usage ()
+    for o, a in opts :
+        if o == '-n' :
+            frames = int (a)
+        elif o == '-s' :
+            resolution = a
+        elif o == '-i' :
+            iso = int (a)
+        elif o == '-r' :
+            from picamera import PiCamera
+            factory = PiCamera
+
+    old = report ("reopen", old_path (factory, frames, resolution, iso) )
+    new = report ("session", new_path (factory, frames, resolution, iso) )
+    sys.stdout.write ("speedup  %0.2fx\n" % (old / new) )
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Compare the old V mode path, where pilapse.sh re-reads every frame
+#-- through fgrep, rm, ln and cat into the encoder, against pilapse.py
+#-- feeding the encoder straight from memory with videncoder.  Both sides
+#-- write every frame to the card first, as capture does.  The encoder
+#-- defaults to a cat into /dev/null; -f uses the real ffmpeg command.
+
+import sys, os, getopt, shutil, tempfile, time, resource, subprocess
+
+from fakecamera import fakecamera
+from videncoder import videncoder
+
+SHELLLOOP = r'''
+WWW="$1" ; shift
+while read img ; do
+    /bin/fgrep -q "#" <<< "$img" && break
+    [ -f "${img}" ] && {
+        /bin/rm -f "${WWW}/latest.jpg"
+        /bin/ln "${img}" "${WWW}/latest.jpg"
+        /bin/cat "${WWW}/latest.jpg"
+    }
+done | "$@"
+'''
+
+# --
+
+def frames_from (dirpath, count) :
+
+    # -- real JPEGs from a session directory, or synthetic ones
+
+    data = []
+    if dirpath :
+        names = sorted ([n for n in os.listdir (dirpath) if n.endswith ('.jpg')])
+        for name in names[0:count] :
+            fh = open (os.path.join (dirpath, name), 'rb')
+            data.append (fh.read ())
+            fh.close ()
+        return data
+    cam = fakecamera (sleeper=lambda s: None)
+    for n in range (0, count) :
+        buf = Grab ()
+        cam.capture (buf)
+        data.append (buf.data)
+    return data
+
+class Grab :
+
+    def __init__ (self) :
+        self.data = b''
+
+    def write (self, b) :
+        self.data += b
+
+# --
+
+def cpu () :
+
+    me = resource.getrusage (resource.RUSAGE_SELF)
+    kids = resource.getrusage (resource.RUSAGE_CHILDREN)
+    return me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime
+
+# --
+
+def save (outdir, n, data) :
+
+    path = os.path.join (outdir, "image-%06d.jpg" % n)
+    fh = open (path, 'wb')
+    fh.write (data)
+    fh.close ()
+    return path
+
+def shell_path (frames, command, workdir) :
+
+    argv = ['bash', '-c', SHELLLOOP, 'pilapse.sh', workdir] + command
+    t0 = time.time ()
+    c0 = cpu ()
+    sh = subprocess.Popen (argv, stdin=subprocess.PIPE)
+    for n in range (0, len (frames)) :
+        path = save (workdir, n, frames[n])
+        sh.stdin.write ((path + "\n").encode ())
+        sh.stdin.flush ()
+    sh.stdin.write (b"#END\n")
+    sh.stdin.close ()
+    sh.wait ()
+    return time.time () - t0, cpu () - c0
+
+def direct_path (frames, command, workdir) :
+
+    t0 = time.time ()
+    c0 = cpu ()
+    enc = videncoder (' '.join (["'%s'" % a for a in command]), "", 0)
+    for n in range (0, len (frames)) :
+        save (workdir, n, frames[n])
+        enc.feed (frames[n])
+    enc.finish (True)
+    return time.time () - t0, cpu () - c0
+
+# --
+
+def usage () :
+    sys.stderr.write ("Usage: %s [-n frames] [-d session-dir] [-f]\n" % sys.argv[0])
+    sys.stderr.write ("    -d takes real JPEGs from a D#### directory\n")
+    sys.stderr.write ("    -f encodes with ffmpeg into a scratch mp4 instead of cat\n")
+    sys.exit (1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    count = 200
+    dirpath = None
+    useffmpeg = False
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "n:d:f")
+    except getopt.GetoptError :
+        usage ()
+    for o, a in opts :
+        if o == '-n' :
+            count = int (a)
+        elif o == '-d' :
+            dirpath = a
+        elif o == '-f' :
+            useffmpeg = True
+
+    frames = frames_from (dirpath, count)
+    work = tempfile.mkdtemp (prefix='pilapse-benchenc-')
+    if useffmpeg :
+        command = ['/usr/local/bin/ffmpeg', '-loglevel', '0', '-y', '-f', 'image2pipe',
+                   '-vcodec', 'mjpeg', '-r', '24', '-i', '-', '-vcodec', 'mpeg4',
+                   '-qscale', '5', '-r', '24', '-f', 'mp4', os.path.join (work, 'out.mp4')]
+    else :
+        command = ['sh', '-c', 'cat > /dev/null']
+
+    try :
+        results = [("shell", shell_path (frames, command, work)),
+                   ("direct", direct_path (frames, command, work))]
+    finally :
+        shutil.rmtree (work, True)
+
+    for name, (wall, used) in results :
+        sys.stdout.write ("%-7s %5d frames  %7.1f fps  cpu %6.2f ms/frame\n"
+            % (name, len (frames), len (frames) / wall, used * 1000 / len (frames)) )
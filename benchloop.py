@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Run the real pilapse main loop on simulated hardware for a number of
+#-- virtual hours and report wakeups, capture jitter (how late each frame
+#-- was against its deadline), deadline misses, CPU time per iteration and
+#-- LCD bytes per second against what whole-line rewrites would have sent.  Exits non-zero when a limit given on the command
+#-- line is exceeded, so it can gate CI on an ordinary Linux box.
+
+import sys, glob, getopt, shutil, tempfile
+
+try :
+    from importlib import reload
+except ImportError :
+    pass                        # python 2 builtin
+
+import pilapse
+from hwsim import simhw
+
+# --
+
+class NullSink :
+
+    # -- pilapse.py's stdout; counts the frame events on the way
+
+    frames = 0
+
+    def write (self, data) :
+        self.frames += data.count ('"ev": "frame"')
+        return len (data)
+
+    def flush (self) :
+        return
+
+# --
+
+def tap (hw, at, pin, hold=0.2) :
+
+    # -- press a button (negative logic) and let it go
+
+    hw.event (at, pin, 0)
+    hw.event (at + hold, pin, 1)
+
+def wheel (hw, at, digit) :
+
+    for bx in range (0, len (pilapse.bcdpins)) :
+        hw.event (at, pilapse.bcdpins[bx], pilapse.bcdcode[digit % 10][bx])
+
+# --
+
+def sc_idle (hw) :
+
+    wheel (hw, 0, 3)
+
+def sc_record (hw) :
+
+    # -- 1 second frames at the default resolution
+
+    wheel (hw, 0, 1)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+def sc_menu_record (hw) :
+
+    # -- pick 2592x1944 and ISO 100 through the menu, then record at 3 s
+
+    wheel (hw, 0, 3)
+    tap (hw, 2.0, pilapse.butpins[1])       # into menu: Resolution
+    tap (hw, 3.0, pilapse.butpins[2])
+    tap (hw, 4.0, pilapse.butpins[2])       # 2592x1944
+    tap (hw, 5.0, pilapse.butpins[1])       # ISO
+    tap (hw, 6.0, pilapse.butpins[2])       # Auto wraps round to 100
+    tap (hw, 12.0, pilapse.butpins[0])      # leave menu
+    tap (hw, 13.0, pilapse.butpins[0])      # start recording
+
+def sc_fast (hw) :
+
+    # -- 0.3 second frames
+
+    pilapse.stepx.setval (0)
+    wheel (hw, 0, 3)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+def sc_overrun (hw) :
+
+    # -- 0.1 second frames that take longer than that to capture
+
+    pilapse.stepx.setval (0)
+    wheel (hw, 0, 1)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+def sc_burst (hw) :
+
+    # -- 10 fps off the video port at the default resolution
+
+    pilapse.modes.setval (2)
+    pilapse.burst.setval (2)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+def sc_still (hw) :
+
+    # -- 1 second frames of a scene that never changes, thinned at 2%
+
+    pilapse.still.setval (2)
+    wheel (hw, 0, 1)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+def sc_adaptive (hw) :
+
+    # -- Adaptive pace from 1 second frames on a scene that never changes
+
+    pilapse.pacing.setval (1)
+    wheel (hw, 0, 1)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+def sc_packed (hw) :
+
+    # -- 1 second frames into segment files
+
+    pilapse.storage.setval (1)
+    wheel (hw, 0, 1)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+def sc_catchup (hw) :
+
+    # -- 1 second frames, Catch up, and one capture that hangs for 5
+    # -- seconds; the overdue frames come back to back
+
+    pilapse.overrun.setval (1)
+    wheel (hw, 0, 1)
+    tap (hw, 2.0, pilapse.butpins[0])
+    hw.stall (30.0, 5.0)
+
+def sc_cycle (hw) :
+
+    # -- 10 minute recordings of 1 second frames, one after another
+
+    pilapse.reclen.setval (0)
+    pilapse.cycle.setval (2)
+    hw.persession = 600     # frames in every session but the last
+    wheel (hw, 0, 1)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+def sc_night (hw) :
+
+    # -- 3 second frames in Night, each a mean of 4 raw ones
+
+    pilapse.modes.setval (3)
+    wheel (hw, 0, 3)
+    tap (hw, 2.0, pilapse.butpins[0])
+
+scenarios = [
+    ('idle', sc_idle),
+    ('record', sc_record),
+    ('menu+record', sc_menu_record),
+    ('fast', sc_fast),
+    ('overrun', sc_overrun),
+    ('burst', sc_burst),
+    ('still', sc_still),
+    ('adaptive', sc_adaptive),
+    ('packed', sc_packed),
+    ('catchup', sc_catchup),
+    ('cycle', sc_cycle),
+    ('night', sc_night),
+]
+
+# --
+
+def pct (vals, p) :
+
+    if not vals :
+        return 0.0
+    vals = sorted (vals)
+    return vals[min (len (vals) - 1, int (len (vals) * p))]
+
+# --
+
+def run (name, setup, hours) :
+
+    # -- fresh module state for every scenario
+
+    reload (pilapse)
+    pilapse.ENCODER = "sh -c 'cat > /dev/null'"     # V mode without ffmpeg
+    lapsdir = tempfile.mkdtemp (prefix='pilapse-bench-')
+    pilapse.set_lapsdir (lapsdir)
+    hw = simhw (hours)
+    setup (hw)
+
+    stdout = sys.stdout
+    sink = NullSink ()
+    sys.stdout = sink
+    try :
+        pilapse.main (hw)
+        # -- every frame event has its own file, unless packed
+        files = sink.frames
+        if pilapse.storage.value() != 'packed' :
+            files = len (glob.glob (lapsdir + "/D[0-9]*/*.jpg"))
+    finally :
+        sys.stdout = stdout
+        shutil.rmtree (lapsdir, True)
+
+    cpu = [c for p, c in hw.loops]
+    misses = len ([l for l in hw.late if l > pilapse.SLEEPSEC])
+    # -- the last session is cut off by the end of the run
+    persession = getattr (hw, 'persession', None)
+    short = [s.frames for s in hw.sessions[:-1]
+             if persession is not None and s.frames != persession]
+
+    res = {
+        'name' : name,
+        'loops' : len (cpu),
+        'wakeph' : len (cpu) / hours,
+        'jit50' : pct (hw.late, 0.50) * 1000,
+        'jit99' : pct (hw.late, 0.99) * 1000,
+        'jitmax' : pct (hw.late, 1.0) * 1000,
+        'frames' : len (hw.late),
+        'misses' : misses,
+        'skipped' : sum ([s.missed for s in hw.sessions]),
+        'cpu' : (sum (cpu) / max (1, len (cpu))) * 1e6,
+        'cpu99' : pct (cpu, 0.99) * 1e6,
+        'cpuph' : sum (cpu) / hours,
+        'lcdold' : pilapse.lcdb.naive / (hours * 3600),
+        'lcdnew' : pilapse.lcdb.written / (hours * 3600),
+        'short' : short,
+        'events' : sink.frames,
+        'files' : files,
+    }
+    return res
+
+# --
+
+def usage () :
+    sys.stderr.write ("Usage: %s [-H hours] [-j max-p99-jitter-ms] [-c max-mean-cpu-us] [-m max-misses] [scenario ...]\n" % sys.argv[0])
+    sys.stderr.write ("    scenarios: %s\n" % ' '.join ([n for n, f in scenarios]))
+    sys.exit (2)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    hours = 1.0
+    maxjit = None
+    maxcpu = None
+    maxmiss = None
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "H:j:c:m:")
+    except getopt.GetoptError :
+        usage ()
+    for o, a in opts :
+        if o == '-H' :
+            hours = float (a)
+        elif o == '-j' :
+            maxjit = float (a)
+        elif o == '-c' :
+            maxcpu = float (a)
+        elif o == '-m' :
+            maxmiss = int (a)
+
+    todo = [s for s in scenarios if not args or s[0] in args]
+    if not todo :
+        usage ()
+
+    sys.stdout.write ("%-12s %8s %8s %8s %8s %8s %7s %6s %7s %8s %8s %8s %8s %8s\n" % ("scenario",
+        "loops", "wakes/h", "jit p50", "jit p99", "jit max", "frames", "late", "skipped",
+        "cpu us", "cpu p99", "cpu s/h", "lcd old", "lcd B/s") )
+    failed = False
+    for name, setup in todo :
+        r = run (name, setup, hours)
+        sys.stdout.write ("%-12s %8d %8d %6.1fms %6.1fms %6.1fms %7d %6d %7d %8.1f %8.1f %8.3f %8.1f %8.1f\n" % (
+            r['name'], r['loops'], r['wakeph'], r['jit50'], r['jit99'], r['jitmax'],
+            r['frames'], r['misses'], r['skipped'], r['cpu'], r['cpu99'], r['cpuph'],
+            r['lcdold'], r['lcdnew']) )
+        if r['files'] != r['events'] :
+            sys.stderr.write ("%s: %d frame events but %d files\n" % (name, r['events'], r['files']))
+            failed = True
+        if r['short'] :
+            sys.stderr.write ("%s: sessions of %s frames\n" % (name, r['short']))
+            failed = True
+        if maxjit is not None and r['jit99'] > maxjit :
+            failed = True
+        if maxcpu is not None and r['cpu'] > maxcpu :
+            failed = True
+        if maxmiss is not None and r['misses'] + r['skipped'] > maxmiss :
+            failed = True
+
+    sys.exit (failed and 1 or 0)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+################################################################################
+# -- capsched class; frame deadlines anchored to start + n * interval
+################################################################################
+
+class capsched :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 12:05:33 $"
+
+    # -- what to do when a capture runs past the next deadline:
+    # --   skip     drop the slots that went by and keep the cadence
+    # --   catchup  take the overdue slots back to back
+    # --   stretch  move the whole grid to start from now
+
+    POLICIES = ('skip', 'catchup', 'stretch')
+
+    def __init__ (self, interval, policy='skip', slack=0.05) :
+
+        # -- times are seconds on a monotonic clock; a frame taken more
+        # -- than slack after its deadline counts as late
+
+        if policy not in self.POLICIES :
+            raise ValueError ("unknown overrun policy %s" % policy)
+        self.interval = float (interval)
+        self.policy = policy
+        self.slack = slack
+        self.start (0.0)
+
+    def start (self, now) :
+
+        # -- the first frame is due one interval from now
+
+        self.anchor = now
+        self.n = 1
+        self.frames = 0
+        self.late = 0
+        self.missed = 0
+        self.dropped = 0        # slots whose frame was captured but not kept
+        self.maxlate = 0.0
+        self.first = None       # when the first and last frames were taken
+        self.last = None
+
+    def due (self) :
+        return self.anchor + self.n * self.interval
+
+    def ready (self, now) :
+        return now >= self.due ()
+
+    def taken (self, at, done, kept=True) :
+
+        # -- a frame was started at and finished by done; move on to the
+        # -- next slot according to the overrun policy.  kept is False
+        # -- when the frame had to be dropped.
+
+        late = at - self.due ()
+        if kept :
+            self.frames += 1
+            if self.first is None :
+                self.first = at
+            self.last = at
+        else :
+            self.dropped += 1
+        if late > self.slack :
+            self.late += 1
+        if late > self.maxlate :
+            self.maxlate = late
+        self.advance (done)
+
+    def advance (self, done) :
+
+        # -- move on to the next slot without counting a frame, as for
+        # -- one left out because nothing had changed
+
+        self.n += 1
+        if self.policy == 'skip' :
+            while self.due () <= done - self.slack :
+                self.n += 1
+                self.missed += 1
+        elif self.policy == 'stretch' :
+            if self.due () < done :
+                # -- the next frame one interval after the late one ended
+                self.anchor = done
+                self.n = 1
+
+    def retime (self, interval) :
+
+        # -- new interval from the slot last taken, without losing the
+        # -- frames already counted
+
+        interval = float (interval)
+        if interval == self.interval :
+            return
+        self.anchor = self.anchor + (self.n - 1) * self.interval
+        self.n = 1
+        self.interval = interval
+
+    def rate (self) :
+
+        # -- frames per second actually achieved, 0 until there are two
+
+        if self.frames < 2 or self.last <= self.first :
+            return 0.0
+        return (self.frames - 1) / (self.last - self.first)
+
+    def stats (self) :
+        return "frames=%d late=%d missed=%d dropped=%d maxlate=%0.3f" % (
+            self.frames, self.late, self.missed, self.dropped, self.maxlate)
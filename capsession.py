@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import io
+
+################################################################################
+# -- streamproxy class; the one stream capture_continuous writes into
+################################################################################
+
+class streamproxy :
+
+    # -- passes each frame through to whatever buffer is current
+
+    def __init__ (self) :
+        self.target = None
+
+    def write (self, b) :
+        return self.target.write (b)
+
+    def flush (self) :
+        return
+
+################################################################################
+# -- capsession class; owns one camera from #VIDEO/#IMAGES to #END
+################################################################################
+
+class capsession :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 09:40:02 $"
+
+    def __init__ (self, factory) :
+
+        # -- factory is called with no arguments and returns a camera,
+        # -- normally picamera.PiCamera
+
+        self.factory = factory
+        self.camera = None
+        self.settings = {}
+        self.locked = False
+        self.shutter = 0
+        self.gain = None
+        self.opens = 0
+        self.proxy = None
+        self.frames = None      # capture_continuous iterator when streaming
+
+    def start (self, resolution, rotation, iso) :
+
+        # -- open the camera if need be and apply the settings
+
+        if self.camera is None :
+            self.camera = self.factory ()
+            self.opens += 1
+            self.settings = {}
+            self.locked = False
+        self.configure (resolution, rotation, iso)
+
+    def configure (self, resolution, rotation, iso) :
+
+        # -- only touch the camera for settings that changed; a new ISO
+        # -- or resolution invalidates the exposure and awb lock.  ISO 0
+        # -- is auto to picamera.
+
+        want = { 'resolution' : resolution, 'rotation' : rotation, 'iso' : iso }
+        changed = False
+        for key in ('iso', 'resolution', 'rotation') :
+            if self.settings.get (key) != want[key] :
+                setattr (self.camera, key, want[key])
+                if key != 'rotation' :
+                    changed = True
+                self.settings[key] = want[key]
+        if changed and self.locked :
+            self.unlock ()
+        return changed
+
+    def lock (self) :
+
+        # -- get shutter and awb from the cam and make them stay that way
+
+        cam = self.camera
+        self.shutter = cam.exposure_speed
+        cam.exposure_mode = 'off'
+        cam.shutter_speed = self.shutter
+        self.gain = cam.awb_gains
+        cam.awb_mode = 'off'
+        cam.awb_gains = self.gain
+        self.locked = True
+
+    def unlock (self) :
+
+        cam = self.camera
+        cam.shutter_speed = 0
+        cam.exposure_mode = 'auto'
+        cam.awb_mode = 'auto'
+        self.locked = False
+
+    def exposure (self) :
+
+        # -- (exposure speed in us, (red, blue) AWB gains, ISO) as set for
+        # -- the frame just taken
+
+        cam = self.camera
+        gains = cam.awb_gains
+        return (int (cam.exposure_speed), (float (gains[0]), float (gains[1])),
+                self.settings.get ('iso', 0))
+
+    def stream (self, rate) :
+
+        # -- keep the video port running at rate fps; each capture then
+        # -- takes the next frame off it with no per-frame setup
+
+        self.camera.framerate = rate
+        self.proxy = streamproxy ()
+        self.frames = self.camera.capture_continuous (self.proxy, format='jpeg',
+                                                      use_video_port=True)
+
+    def thumb (self, size) :
+
+        # -- a small yuv frame off the video port, for telling whether
+        # -- anything changed.  Splitter port 1 leaves port 0 to stream().
+
+        out = io.BytesIO ()
+        self.camera.capture (out, format='yuv', resize=size,
+                             use_video_port=True, splitter_port=1)
+        return out.getvalue ()
+
+    def raw (self, output) :
+
+        # -- an RGB frame off the still port into the buffer output,
+        # -- padded to 32x16 blocks; for stacking in the Night mode
+
+        self.camera.capture (output, format='rgb')
+
+    def capture (self, output) :
+
+        # -- output is a file name or a writable stream; streams only
+        # -- once stream() has been called
+
+        if self.frames is not None :
+            self.proxy.target = output
+            next (self.frames)
+            self.proxy.target = None
+        else :
+            self.camera.capture (output, format='jpeg')
+
+    def stop (self) :
+
+        if self.frames is not None :
+            self.frames.close ()
+        self.frames = None
+        self.proxy = None
+        if self.camera is not None :
+            self.camera.close ()
+        self.camera = None
+        self.settings = {}
+        self.locked = False
+
+    def active (self) :
+
+        return self.camera is not None
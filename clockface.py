@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Analog clock overlay, after clockface.pl.  Each of the 720 hand
+#-- positions (hours 0-11 by minutes 0-59) is drawn once into an RGBA
+#-- sprite and cached by size, colour and gravity, so stamping a frame
+#-- is a paste through the sprite's alpha rather than a fresh drawing.
+#-- pilapse.py stamps frames on their way to the video encoder; run as
+#-- a command it takes the same options as clockface.pl.
+
+import io, re, sys, time, math, getopt
+
+try :
+    from PIL import Image, ImageDraw
+except ImportError :
+    Image = None        # no clock without PIL
+
+################################################################################
+# -- clockface class; a sprite per hand position, blended into frames
+################################################################################
+
+class clockface :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 18:52:06 $"
+
+    GRAVITIES = ('nw', 'ne', 'sw', 'se')
+    BUFFER = 5          # pixels between the clock and the edges
+    SUPER = 4           # sprites are drawn this much bigger, then shrunk
+
+    sprites = {}        # (size, color, gravity) -> { (h, m) : sprite }
+
+    def __init__ (self, size=50, color='#ffffff', gravity='se', quality=90) :
+
+        if Image is None :
+            raise ImportError ("clockface needs PIL")
+        gravity = gravity.lower ()
+        if gravity not in self.GRAVITIES :
+            raise ValueError ("invalid gravity %s" % gravity)
+        self.size = size
+        self.color = color
+        self.gravity = gravity
+        self.quality = quality
+        self.cache = self.sprites.setdefault ((size, color, gravity), {})
+        self.stamped = 0
+        self.drawn = 0
+        self.tsum = 0.0
+
+    def sprite (self, h, m) :
+
+        # -- the clock showing h:m, drawn the first time it is asked for
+
+        key = (h % 12, m % 60)
+        sp = self.cache.get (key)
+        if sp is None :
+            sp = self._draw (key[0], key[1])
+            self.cache[key] = sp
+            self.drawn += 1
+        return sp
+
+    def prerender (self) :
+
+        for h in range (0, 12) :
+            for m in range (0, 60) :
+                self.sprite (h, m)
+
+    def _draw (self, h, m) :
+
+        # -- bezel, then hour and minute hands, each a light stroke under
+        # -- a thin black one, as clockface.pl draws them
+
+        k = self.SUPER
+        size = self.size * k
+        pad = 2 * k
+        im = Image.new ('RGBA', (size + 2 * pad, size + 2 * pad), (0, 0, 0, 0))
+        draw = ImageDraw.Draw (im)
+        c = pad + size / 2.0
+        r = size / 2.0
+        draw.ellipse ((c - r, c - r, c + r, c + r), fill=(128, 128, 128, 128),
+                      outline=self.color, width=int (3.5 * k))
+        draw.ellipse ((c - r, c - r, c + r, c + r), outline=(0, 0, 0, 128), width=k)
+        hpct = (h + m / 60.0) / 12.0
+        mpct = m / 60.0
+        for pct, length, width in ((hpct, size / 3.2, 3.5), (mpct, size / 2.3, 2.5)) :
+            end = (c + length * math.sin (pct * 2 * math.pi),
+                   c - length * math.cos (pct * 2 * math.pi))
+            draw.line (((c, c), end), fill=self.color, width=int (width * k))
+            draw.line (((c, c), end), fill=(0, 0, 0, 255), width=k)
+        edge = self.size + 4
+        return im.resize ((edge, edge), Image.LANCZOS)
+
+    def place (self, width, height) :
+
+        # -- top left corner of the sprite in a width x height frame
+
+        edge = self.size + 4
+        if self.gravity[0] == 'n' :
+            y = self.BUFFER - 2
+        else :
+            y = height - edge - self.BUFFER + 2
+        if self.gravity[1] == 'w' :
+            x = self.BUFFER - 2
+        else :
+            x = width - edge - self.BUFFER + 2
+        return (x, y)
+
+    def blend (self, im, h, m) :
+
+        # -- put the clock on a PIL image in place
+
+        sp = self.sprite (h, m)
+        im.paste (sp, self.place (im.size[0], im.size[1]), sp)
+        return im
+
+    def stamp (self, data, t) :
+
+        # -- JPEG bytes with the clock for time t (seconds since the
+        # -- epoch, local time) on them; unreadable data comes back as is
+
+        t0 = time.time ()
+        try :
+            im = Image.open (io.BytesIO (data))
+            im.load ()
+        except (IOError, ValueError) :
+            return data
+        lt = time.localtime (t)
+        self.blend (im, lt.tm_hour, lt.tm_min)
+        out = io.BytesIO ()
+        im.save (out, 'JPEG', quality=self.quality)
+        self.stamped += 1
+        self.tsum += time.time () - t0
+        return out.getvalue ()
+
+    def stats (self) :
+        return "stamped=%d drawn=%d avg=%0.1fms" % (
+            self.stamped, self.drawn, self.tsum * 1000 / max (1, self.stamped))
+
+# --
+
+def usage (msg=None) :
+    if msg :
+        sys.stderr.write ("%s\n" % msg)
+    sys.stderr.write ("Usage: %s -o format-%%d.string -g nw|ne|sw|se [-c colorspec] [-s clockpixelsize] [-h hours] [-m minutes] file [file ...]\n" % sys.argv[0])
+    sys.exit (1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    outfmt = None
+    gravity = None
+    color = '#ffffff'
+    size = 50
+    houradj = 0
+    minadj = 0
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "o:g:c:s:h:m:")
+    except getopt.GetoptError :
+        usage ()
+    for o, a in opts :
+        if o == '-o' :
+            outfmt = a
+        elif o == '-g' :
+            gravity = a
+        elif o == '-c' :
+            color = a
+        elif o == '-s' :
+            size = int (a)
+        elif o == '-h' :
+            houradj = int (a)
+        elif o == '-m' :
+            minadj = int (a)
+    if not outfmt or not gravity :
+        usage ()
+    if size <= 0 :
+        usage ("Clock pixel size must be a positive integer")
+    try :
+        clock = clockface (size, color, gravity, 100)
+    except ValueError as e :
+        usage ("Invalid gravity")
+
+    t0 = time.time ()
+    n = 0
+    for fname in args :
+        stamp = re.search (r'T(\d\d)(\d\d)(\d\d)\D', fname)
+        if stamp is None :
+            continue
+        n += 1
+        h = (int (stamp.group (1)) + houradj) % 24
+        m = (int (stamp.group (2)) + minadj) % 60
+        im = Image.open (fname)
+        clock.blend (im, h, m)
+        im.save (outfmt % n, quality=100)
+    dt = max (1e-6, time.time () - t0)
+    sys.stderr.write ("%d clocks drawn in %0.1f seconds (%0.3fs each, %0.2f/s)\n"
+        % (n, dt, dt / max (1, n), n / dt))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- The receiving end for uploader.py: a stand-in for whatever collects
+#-- frames from the fleet, and what the uploader is tested against.  Each
+#-- unit's bundles are unpacked under its own directory, and the number of
+#-- the last bundle unpacked is kept there in .have, so a unit that
+#-- reconnects is told where to carry on from.
+
+import sys, os, io, re, json, tarfile, getopt
+
+try :
+    import socketserver
+except ImportError :
+    import SocketServer as socketserver     # python 2
+
+from uploader import PORT, message
+
+UNITPAT = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+################################################################################
+# -- collector class; one connection from one unit
+################################################################################
+
+class collector (socketserver.StreamRequestHandler) :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 22:20:31 $"
+
+    root = "."          # set by serve()
+
+    def _have (self) :
+        try :
+            fh = open(os.path.join(self.dir, ".have"))
+            have = int(fh.read().strip() or 0)
+            fh.close()
+            return have
+        except (IOError, OSError, ValueError) :
+            return 0
+
+    def _keep (self, q) :
+        tmp = os.path.join(self.dir, ".have.tmp")
+        fh = open(tmp, 'w')
+        fh.write("%d\n" % q)
+        fh.close()
+        os.rename(tmp, os.path.join(self.dir, ".have"))
+
+    def _unpack (self, payload) :
+
+        # -- only plain files, and only under this unit's directory
+
+        tar = tarfile.open(fileobj=io.BytesIO(payload), mode='r:*')
+        count = 0
+        for info in tar.getmembers() :
+            parts = info.name.split('/')
+            if not info.isfile() or info.name.startswith('/') or '..' in parts :
+                continue
+            dest = os.path.join(self.dir, *parts)
+            if not os.path.isdir(os.path.dirname(dest)) :
+                os.makedirs(os.path.dirname(dest))
+            fh = open(dest, 'wb')
+            fh.write(tar.extractfile(info).read())
+            fh.close()
+            count += 1
+        tar.close()
+        return count
+
+    def handle (self) :
+
+        hello = json.loads(self.rfile.readline().decode('utf-8'))
+        unit = hello.get('unit', '')
+        if not UNITPAT.match(unit) :
+            return
+        self.dir = os.path.join(self.root, unit)
+        if not os.path.isdir(self.dir) :
+            os.makedirs(self.dir)
+        have = self._have()
+        self.wfile.write(message({ 'have' : have }))
+        sys.stderr.write("%s: connected, has %d\n" % (unit, have))
+
+        while True :
+            line = self.rfile.readline()
+            if not line :
+                break
+            head = json.loads(line.decode('utf-8'))
+            payload = self.rfile.read(head['size'])
+            if len(payload) < head['size'] :
+                break           # cut off; it will come again
+            if head['bundle'] > have :
+                got = self._unpack(payload)
+                have = head['bundle']
+                self._keep(have)
+                sys.stderr.write("%s: %d frames to %d\n" % (unit, got, have))
+            self.wfile.write(message({ 'ack' : have }))
+        sys.stderr.write("%s: gone\n" % unit)
+
+# --
+
+def serve (root, port=PORT) :
+
+    collector.root = root
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer(('', port), collector)
+    server.daemon_threads = True
+    return server
+
+# --
+
+def usage () :
+    sys.stderr.write ("Usage: %s [-d directory] [-p port]\n" % sys.argv[0])
+    sys.exit (1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    root = "."
+    port = PORT
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "d:p:")
+    except getopt.GetoptError :
+        usage ()
+    for o, a in opts :
+        if o == '-d' :
+            root = a
+        elif o == '-p' :
+            port = int (a)
+
+    if not os.path.isdir (root) :
+        sys.stderr.write ("%s: No such directory\n" % root)
+        sys.exit (1)
+
+    server = serve (root, port)
+    try :
+        server.serve_forever ()
+    except KeyboardInterrupt :
+        pass
+    server.server_close ()
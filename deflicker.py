@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Streaming deflicker.  Each frame's mean luminance is measured from a
+#-- 1/8 scale decode, and the frame is scaled to the mean of the frames
+#-- around it in a sliding window.  Frames are held until the second
+#-- half of their window has arrived, so memory is the window and not
+#-- the session.  pilapse.py runs it in the encoder thread; run as a
+#-- command it corrects a D#### directory onto stdout for ffmpeg.
+
+import io, os, sys, time, glob, getopt, collections
+
+try :
+    from PIL import Image, ImageStat
+except ImportError :
+    Image = None        # no deflicker without PIL
+
+################################################################################
+# -- deflicker class; one pass, window frames of memory
+################################################################################
+
+class deflicker :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 18:11:27 $"
+
+    MAXGAIN = 2.0       # never scale by more than this, or less than 1/it
+    MINGAIN = 0.01      # closer to 1 than this and the frame goes as it is
+
+    def __init__ (self, window=15, quality=90) :
+
+        if Image is None :
+            raise ImportError ("deflicker needs PIL")
+        self.radius = window // 2
+        self.quality = quality
+        self.means = collections.deque (maxlen=2 * self.radius + 1)
+        self.held = collections.deque ()
+        self.n = 0
+        self.frames = 0
+        self.corrected = 0
+        self.maxgain = 1.0
+        self.tsum = 0.0
+
+    def luma (self, data) :
+
+        # -- mean luminance, decoding at 1/8 scale only
+
+        im = Image.open (io.BytesIO (data))
+        im.draft ('L', (max (1, im.size[0] // 8), max (1, im.size[1] // 8)))
+        return ImageStat.Stat (im.convert ('L')).mean[0]
+
+    def push (self, data, tag=None) :
+
+        # -- take a JPEG; returns (jpeg, tag) for the frames now ready,
+        # -- in order.  tag rides along untouched.
+
+        t0 = time.time ()
+        try :
+            mean = self.luma (data)
+            self.means.append ((self.n, mean))
+        except (IOError, ValueError) :
+            mean = None         # not a JPEG PIL can read; pass it through
+        self.held.append ((self.n, data, mean, tag))
+        self.n += 1
+        out = []
+        while self.held and self.held[0][0] + self.radius < self.n :
+            out.append (self._emit (self.held.popleft ()))
+        self.tsum += time.time () - t0
+        return out
+
+    def flush (self) :
+
+        # -- the frames still held, once no more are coming
+
+        out = []
+        while self.held :
+            out.append (self._emit (self.held.popleft ()))
+        return out
+
+    def _emit (self, frame) :
+
+        idx, data, mean, tag = frame
+        self.frames += 1
+        return (self._correct (idx, data, mean), tag)
+
+    def _correct (self, idx, data, mean) :
+
+        if mean is None or not self.means :
+            return data
+        around = [m for j, m in self.means if abs (j - idx) <= self.radius]
+        target = sum (around) / len (around)
+        gain = target / max (mean, 1.0)
+        gain = min (self.MAXGAIN, max (1.0 / self.MAXGAIN, gain))
+        if abs (gain - 1.0) < self.MINGAIN :
+            return data
+        if abs (gain - 1.0) > abs (self.maxgain - 1.0) :
+            self.maxgain = gain
+        self.corrected += 1
+        im = Image.open (io.BytesIO (data))
+        table = [min (255, int (v * gain + 0.5)) for v in range (256)]
+        im = im.point (table * len (im.getbands ()))
+        out = io.BytesIO ()
+        im.save (out, 'JPEG', quality=self.quality)
+        return out.getvalue ()
+
+    def stats (self) :
+        return "frames=%d corrected=%d maxgain=%0.2f avg=%0.1fms" % (
+            self.frames, self.corrected, self.maxgain,
+            self.tsum * 1000 / max (1, self.frames))
+
+# --
+
+def usage () :
+    sys.stderr.write ("Usage: %s [-w window] [-q quality] [-o outdir] D####\n" % sys.argv[0])
+    sys.stderr.write ("    without -o the corrected JPEGs go to stdout, for ffmpeg -f image2pipe\n")
+    sys.exit (1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    window = 15
+    quality = 90
+    outdir = None
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "w:q:o:")
+    except getopt.GetoptError :
+        usage ()
+    for o, a in opts :
+        if o == '-w' :
+            window = int (a)
+        elif o == '-q' :
+            quality = int (a)
+        elif o == '-o' :
+            outdir = a
+    if len (args) != 1 :
+        usage ()
+
+    names = sorted (glob.glob (os.path.join (args[0], "*.jpg")))
+    flick = deflicker (window, quality)
+    out = getattr (sys.stdout, 'buffer', sys.stdout)
+    def put (frames) :
+        for data, name in frames :
+            if outdir is None :
+                out.write (data)
+            else :
+                fh = open (os.path.join (outdir, os.path.basename (name)), 'wb')
+                fh.write (data)
+                fh.close ()
+
+    for name in names :
+        fh = open (name, 'rb')
+        data = fh.read ()
+        fh.close ()
+        put (flick.push (data, name))
+    put (flick.flush ())
+    sys.stderr.write ("deflicker %s\n" % flick.stats ())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- The capture engine and the user interface of pilapse.py, apart.  The UI
+#-- sends the engine commands and reads back a status block; it never
+#-- touches the camera, the card or the encoder itself, so a long capture
+#-- cannot freeze the buttons and a slow LCD cannot delay a shot.
+#--
+#-- localengine runs the engine in the UI's own loop, which is what the
+#-- simulator needs; engineproc forks it into a process of its own, with
+#-- the status in a small shared memory block and the commands on a queue.
+
+import mmap
+import time
+import struct
+import multiprocessing
+
+try :
+    import queue
+except ImportError :
+    import Queue as queue       # python 2
+
+# -- why the last session ended
+WHY = ['', 'Off', 'Length', 'Card full']
+
+################################################################################
+# -- statusblock class; what the engine is doing, in shared memory
+################################################################################
+
+class statusblock :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 23:05:16 $"
+
+    # -- a sequence number, odd while the engine is writing, then the
+    # -- fields of STATUS in order
+    SEQ = struct.Struct('<I')
+    STATUS = struct.Struct('<BBBxIIIIIQddffffffff')
+    SPIN = 1000     # tries at a consistent copy before giving up on one
+    FIELDS = ('ready', 'recording', 'why', 'dirnum', 'frames', 'shots',
+              'dropped', 'stills', 'free', 'interval', 'left', 'rate',
+              'loop_seconds', 'capture_seconds', 'write_seconds',
+              'lcd_seconds', 'slip_seconds', 'stack_seconds',
+              'boot_seconds')
+
+    def __init__ (self) :
+
+        # -- an anonymous shared mapping; a forked child sees the same page
+
+        self.map = mmap.mmap(-1, mmap.PAGESIZE)
+        self.seq = 0
+        self.last = None        # the reader's last consistent copy
+
+    def write (self, status) :
+
+        # -- odd sequence, the fields, then the even sequence last, so a
+        # -- reader never sees an even one over half-written fields
+
+        values = [status[k] for k in self.FIELDS]
+        values[2] = WHY.index(status['why'])
+        body = self.STATUS.pack(*values)
+        self.seq += 1
+        self.map[0:4] = self.SEQ.pack(self.seq)
+        self.map[4:4 + len(body)] = body
+        self.seq += 1
+        self.map[0:4] = self.SEQ.pack(self.seq)
+
+    def read (self, alive=None) :
+
+        # -- a consistent copy; try again if the engine was part way
+        # -- through.  If it stays part way through, or alive() says the
+        # -- engine is gone, the last good copy is returned instead
+
+        end = 4 + self.STATUS.size
+        for n in range(0, self.SPIN) :
+            before = self.SEQ.unpack(self.map[0:4])[0]
+            body = self.map[4:end]
+            if before & 1 == 0 and self.SEQ.unpack(self.map[0:4])[0] == before :
+                status = dict(zip(self.FIELDS, self.STATUS.unpack(body)))
+                status['why'] = WHY[status['why']]
+                self.last = status
+                return status
+            if n % 100 == 99 :
+                if alive is not None and not alive() :
+                    break
+                time.sleep(0.001)
+        if self.last is None :
+            status = dict(zip(self.FIELDS, self.STATUS.unpack(self.map[4:end])))
+            status['why'] = WHY[min(status['why'], len(WHY) - 1)]
+            return status
+        return self.last
+
+################################################################################
+# -- localengine class; the engine run from the UI loop
+################################################################################
+
+class localengine :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 23:05:16 $"
+
+    def __init__ (self, init, handle, step, status, stop) :
+
+        # -- init() sets the engine up; handle(cmd, arg) acts on a command;
+        # -- step() does whatever is due and returns when it next needs to
+        # -- run, or None; status() is a dict of statusblock.FIELDS; stop()
+        # -- ends a recording and winds everything down
+
+        self.setup = init
+        self.handle = handle
+        self.step = step
+        self.getstatus = status
+        self.finish = stop
+        self.due = None
+        self.last = None        # status as of the last command or pass
+
+    def start (self) :
+        self.setup()
+
+    def send (self, cmd, arg=None) :
+        self.handle(cmd, arg)
+        self.last = None
+
+    def run (self) :
+
+        # -- the UI calls this every pass, and sleeps no later than deadline()
+
+        self.due = self.step()
+        self.last = None
+
+    def deadline (self) :
+        return self.due
+
+    def status (self) :
+
+        # -- nothing changes but through send() and run()
+        if self.last is None :
+            self.last = self.getstatus()
+        return self.last
+
+    def alive (self) :
+        return True
+
+    def stop (self) :
+        self.finish()
+
+################################################################################
+# -- engineproc class; the engine in a process of its own
+################################################################################
+
+class engineproc (localengine) :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 23:05:16 $"
+
+    def __init__ (self, init, handle, step, status, stop, clock, poke=None) :
+
+        # -- clock is the engine's monotonic clock and poke, if given, wakes
+        # -- the UI when the status changes
+
+        localengine.__init__(self, init, handle, step, status, stop)
+        self.clock = clock
+        self.poke = poke
+        self.block = statusblock()
+        self.commands = None
+        self.proc = None
+
+    def _publish (self, last) :
+
+        status = self.getstatus()
+        if status != last :
+            self.block.write(status)
+            if self.poke is not None :
+                self.poke()
+        return status
+
+    def _main (self) :
+
+        # -- the engine process: sleep on the command queue until the next
+        # -- thing is due
+
+        last = None
+        due = None
+        try :
+            self.setup()
+            last = self._publish(last)
+            while True :
+                timeout = None
+                if due is not None :
+                    timeout = max(0, due - self.clock())
+                try :
+                    cmd, arg = self.commands.get(True, timeout)
+                    if cmd == 'quit' :
+                        break
+                    self.handle(cmd, arg)
+                except queue.Empty :
+                    pass
+                due = self.step()
+                last = self._publish(last)
+        except KeyboardInterrupt :
+            pass
+        self.finish()
+        self._publish(last)
+
+    def start (self) :
+
+        # -- fork, so the child starts with the UI's menus and settings;
+        # -- its threads are started by init() in the child
+
+        if hasattr(multiprocessing, 'get_context') :
+            mp = multiprocessing.get_context('fork')
+        else :
+            mp = multiprocessing
+        self.commands = mp.Queue()
+        self.proc = mp.Process(target=self._main, name="engine")
+        self.proc.start()
+
+    def send (self, cmd, arg=None) :
+        self.commands.put((cmd, arg))
+
+    def run (self) :
+        return
+
+    def deadline (self) :
+        return None
+
+    def status (self) :
+        return self.block.read(self.alive)
+
+    def alive (self) :
+        return self.proc is not None and self.proc.is_alive()
+
+    def stop (self) :
+
+        # -- the engine ends the recording and finishes its videos
+
+        if self.proc is None :
+            return
+        if self.proc.is_alive() :
+            self.send('quit')
+        self.proc.join()
+        self.proc = None
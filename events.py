@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- The event stream pilapse.py writes on stdout: one JSON object per line,
+#-- each with the protocol version "v" and the event name "ev".
+#--
+#--   start   n, dir, t, mode, for V, B and N modes video and fps, for B
+#--           burst, for N stack
+#--   frame   path, size, t, n, seq, interval, exposure, awb, iso, for N
+#--           stack and stack_ms, and with PIL preview, thumb (packed:
+#--           preview only, the session's newest)
+#--   still   n, t, diff; a frame left out as unchanged
+#--   end     n, t, frames, late, missed, for B rate and dropped, and still
+#--           when unchanged frames were left out, for N stack
+#--
+#-- Readers skip events they do not know, and lines of a newer version.
+
+import json
+
+PROTOCOL = 1
+
+# --
+
+def encode (ev, **fields) :
+
+    fields['v'] = PROTOCOL
+    fields['ev'] = ev
+    return json.dumps (fields, sort_keys=True) + "\n"
+
+# --
+
+def decode (line) :
+
+    # -- the event as a dict, or None for anything that is not one we read
+
+    try :
+        rec = json.loads (line)
+    except ValueError :
+        return None
+    if not isinstance (rec, dict) or rec.get ('v') != PROTOCOL or 'ev' not in rec :
+        return None
+    return rec
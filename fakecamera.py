@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import time
+
+################################################################################
+# -- fakecamera class; stands in for picamera.PiCamera off the Pi
+################################################################################
+
+class fakecamera :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 09:12:40 $"
+
+    # -- simulated costs in seconds; the defaults are in the neighbourhood
+    # -- of what a Pi Zero W with the v1 camera module shows
+
+    opendelay = 0.35    # PiCamera() construction and sensor init
+    closedelay = 0.05   # camera.close()
+    capdelay  = 0.12    # still port capture, excluding the file write
+    bytesper  = 0.1     # JPEG bytes per pixel
+    portdelay = 0.25    # starting the video port encoder
+    luma      = 128     # brightness of every pixel; the scene never changes
+
+    def __init__ (self, sleeper=None) :
+
+        # -- sleeper lets a simulation burn the delays on its own clock
+
+        self.sleeper = sleeper or time.sleep
+        self.sleeper (self.opendelay)
+        self.closed = False
+        self.resolution = '1280x720'
+        self.rotation = 0
+        self.iso = 0
+        self.exposure_mode = 'auto'
+        self.awb_mode = 'auto'
+        self.shutter_speed = 0
+        self.exposure_speed = 16667
+        self.awb_gains = (1.5, 1.2)
+        self.framerate = 30
+        self.frames = 0
+
+    def _size (self) :
+
+        # -- roughly what a JPEG of the current resolution weighs
+
+        w, h = str(self.resolution).split('x')
+        return max (4, int (int(w) * int(h) * self.bytesper) )
+
+    def _frame (self) :
+        return b'\xff\xd8' + b'\0' * (self._size () - 4) + b'\xff\xd9'
+
+    def _rgb (self, size) :
+
+        w = (size[0] + 31) // 32 * 32
+        h = (size[1] + 15) // 16 * 16
+        return bytes (bytearray ([self.luma]) * (w * h * 3))
+
+    def _yuv (self, size) :
+
+        # -- YUV420 padded to 32x16 blocks like the GPU does it
+
+        w = (size[0] + 31) // 32 * 32
+        h = (size[1] + 15) // 16 * 16
+        return bytes (bytearray ([self.luma]) * (w * h)) + b'\x80' * (w * h // 2)
+
+    def capture (self, output, format='jpeg', use_video_port=False, resize=None, **options) :
+
+        # -- output is a file name, a writable stream or a buffer, as
+        # -- with picamera
+
+        if self.closed :
+            raise RuntimeError ("camera is closed")
+        if use_video_port :
+            self.sleeper (1.0 / self.framerate)
+        else :
+            self.sleeper (self.capdelay)
+        if format == 'yuv' :
+            data = self._yuv (resize or [int (v) for v in str(self.resolution).split('x')])
+        elif format == 'rgb' :
+            data = self._rgb (resize or [int (v) for v in str(self.resolution).split('x')])
+        else :
+            self.frames += 1
+            data = self._frame ()
+        if hasattr (output, 'write') :
+            output.write (data)
+        elif isinstance (output, bytearray) :
+            output[0:len (data)] = data
+        else :
+            fh = open (output, 'wb')
+            fh.write (data)
+            fh.close ()
+
+    def capture_continuous (self, output, format='jpeg', use_video_port=False, **options) :
+
+        # -- one frame per iteration into the stream output; the video
+        # -- port delivers them at framerate once it is going
+
+        if self.closed :
+            raise RuntimeError ("camera is closed")
+        if use_video_port :
+            self.sleeper (self.portdelay)
+        while True :
+            if use_video_port :
+                self.sleeper (1.0 / self.framerate)
+            else :
+                self.sleeper (self.capdelay)
+            self.frames += 1
+            output.write (self._frame ())
+            yield output
+
+    def close (self) :
+
+        if not self.closed :
+            self.sleeper (self.closedelay)
+        self.closed = True
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import time
+
+try :
+    import numpy
+except ImportError :
+    numpy = None        # no change detection without it
+
+################################################################################
+# -- framediff class; tells frames that show nothing new from the last kept
+################################################################################
+
+class framediff :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 17:02:51 $"
+
+    # -- size of the luma thumbnail taken beside each frame.  picamera
+    # -- pads yuv captures to 32x16 blocks, so at this size the Y plane
+    # -- is exactly w*h bytes at the front of the capture.
+
+    THUMB = (64, 48)
+
+    def __init__ (self, threshold, keepevery=0) :
+
+        # -- threshold is the mean absolute luma difference, in percent
+        # -- of full scale, below which a frame is the same as the last
+        # -- one kept.  With keepevery, one in that many same frames in
+        # -- a row is kept anyway, thinning a still scene rather than
+        # -- dropping it; 0 drops them all.
+
+        if numpy is None :
+            raise ImportError ("framediff needs numpy")
+        self.threshold = threshold * 255 / 100.0
+        self.keepevery = keepevery
+        self.ref = None         # luma of the last frame kept
+        self.run = 0            # same frames skipped in a row
+        self.last = 0.0         # difference of the last frame, percent
+        self.compared = 0
+        self.skipped = 0
+        self.tsum = 0.0
+        self.tmax = 0.0
+
+    def same (self, yuv) :
+
+        # -- True if the frame with thumbnail yuv should be left out.
+        # -- The reference only moves on kept frames, so a slow drift
+        # -- still adds up to a kept frame.
+
+        t0 = time.time ()
+        w, h = self.THUMB
+        y = numpy.frombuffer (yuv, dtype=numpy.uint8, count=w * h).astype (numpy.int16)
+        if self.ref is None :
+            diff = 255.0
+        else :
+            diff = float (numpy.abs (y - self.ref).mean ())
+        self.last = diff * 100 / 255
+        skip = diff < self.threshold
+        if skip and self.keepevery and self.run + 1 >= self.keepevery :
+            skip = False
+        if skip :
+            self.run += 1
+            self.skipped += 1
+        else :
+            self.ref = y
+            self.run = 0
+        self.compared += 1
+        dt = time.time () - t0
+        self.tsum += dt
+        if dt > self.tmax :
+            self.tmax = dt
+        return skip
+
+    def stats (self) :
+        return "compared=%d skipped=%d avg=%0.2fms max=%0.2fms" % (
+            self.compared, self.skipped,
+            self.tsum * 1000 / max (1, self.compared), self.tmax * 1000)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import mmap
+import struct
+
+#-- A session's frame index, D####/frames.idx: a 32 byte header and then
+#-- one 32 byte record per frame written, in the order they were taken.
+#--
+#--   t         double  seconds since the epoch
+#--   seq       uint32  frame number in the session
+#--   size      uint32  bytes of JPEG
+#--   exposure  uint32  exposure speed in microseconds
+#--   red, blue float   AWB gains
+#--   iso       uint16  0 for auto
+#--
+#-- Records are only ever appended, so a power cut can at worst leave a
+#-- torn last record, which readers ignore.
+
+INDEXFILE = "frames.idx"
+MAGIC = b'PLIX'
+VERSION = 1
+HEADER = struct.Struct('<4sHH24x')
+RECORD = struct.Struct('<dIIIffH2x')
+
+################################################################################
+# -- indexwriter class; appends one record per frame
+################################################################################
+
+class indexwriter :
+
+    def __init__ (self, path) :
+
+        new = not os.path.exists(path) or os.path.getsize(path) < HEADER.size
+        self.fh = open(path, 'ab')
+        if new :
+            self.fh.truncate(0)
+            self.fh.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self.path = path
+
+    def append (self, t, seq, size, exposure=0, gains=(0.0, 0.0), iso=0) :
+
+        self.fh.write(RECORD.pack(t, seq, size, int(exposure),
+                                  float(gains[0]), float(gains[1]), int(iso)))
+        self.fh.flush()
+
+    def close (self) :
+        self.fh.close()
+
+################################################################################
+# -- frameindex class; memory-mapped reader of a session's index
+################################################################################
+
+class frameindex :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 19:44:10 $"
+
+    FIELDS = ('t', 'seq', 'size', 'exposure', 'red', 'blue', 'iso')
+
+    def __init__ (self, path) :
+
+        # -- path is the index file or the D#### directory holding it
+
+        if os.path.isdir(path) :
+            path = os.path.join(path, INDEXFILE)
+        self.path = path
+        self.fh = open(path, 'rb')
+        self.map = None
+        self.count = 0
+        self.refresh()
+
+    def refresh (self) :
+
+        # -- map again to see frames appended since; returns the count
+
+        size = os.fstat(self.fh.fileno()).st_size
+        if size < HEADER.size :
+            return self.count
+        if self.map is not None :
+            self.map.close()
+        self.map = mmap.mmap(self.fh.fileno(), size, access=mmap.ACCESS_READ)
+        magic, version, recsize = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or recsize != RECORD.size :
+            raise ValueError("%s: not a frame index this reads" % self.path)
+        self.count = (size - HEADER.size) // RECORD.size
+        return self.count
+
+    def __len__ (self) :
+        return self.count
+
+    def __getitem__ (self, n) :
+        return self.nth(n)
+
+    def nth (self, n) :
+
+        # -- the n'th frame (negative counts from the end) as a dict
+
+        if n < 0 :
+            n += self.count
+        if n < 0 or n >= self.count :
+            raise IndexError("frame %d of %d" % (n, self.count))
+        return dict(zip(self.FIELDS, RECORD.unpack_from(self.map, HEADER.size + n * RECORD.size)))
+
+    def time (self, n) :
+        return struct.unpack_from('<d', self.map, HEADER.size + n * RECORD.size)[0]
+
+    def bisect (self, t) :
+
+        # -- the first frame taken at or after t
+
+        lo, hi = 0, self.count
+        while lo < hi :
+            mid = (lo + hi) // 2
+            if self.time(mid) < t :
+                lo = mid + 1
+            else :
+                hi = mid
+        return lo
+
+    def between (self, t0, t1) :
+
+        # -- (first, end) frame numbers of those taken in [t0, t1)
+
+        return self.bisect(t0), self.bisect(t1)
+
+    def frames (self, t0, t1) :
+        first, end = self.between(t0, t1)
+        return [self.nth(n) for n in range(first, end)]
+
+    def nbytes (self) :
+        return sum([self.nth(n)['size'] for n in range(0, self.count)])
+
+    def close (self) :
+
+        if self.map is not None :
+            self.map.close()
+        self.map = None
+        self.fh.close()
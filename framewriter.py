@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import threading
+
+import events
+from frameindex import indexwriter
+from segstore import segwriter
+
+try :
+    import queue
+except ImportError :
+    import Queue as queue       # python 2
+
+################################################################################
+# -- framebuf class; a reusable in-memory file for one JPEG
+################################################################################
+
+class framebuf :
+
+    def __init__ (self) :
+
+        # -- grows to the largest frame it has held and stays that size
+
+        self.data = bytearray()
+        self.length = 0
+        self.path = None
+        self.meta = None
+
+    def write (self, b) :
+
+        n = len(b)
+        end = self.length + n
+        if end > len(self.data) :
+            self.data.extend(bytearray(end - len(self.data)))
+        self.data[self.length:end] = b
+        self.length = end
+        return n
+
+    def flush (self) :
+        return
+
+    def view (self) :
+        return memoryview(self.data)[0:self.length]
+
+    def reset (self) :
+
+        self.length = 0
+        self.path = None
+        self.meta = None
+
+################################################################################
+# -- framewriter class; persists captured frames on a thread of its own
+################################################################################
+
+class framewriter :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 14:41:19 $"
+
+    def __init__ (self, nbufs, out=None, threaded=True, preview=None, meters=None) :
+
+        # -- nbufs frames can be in flight at once.  When all are waiting
+        # -- on the card, get() returns None and the caller drops the new
+        # -- frame; frames already taken are never thrown away.  Every
+        # -- line for out goes through the queue, so session events and
+        # -- frame events stay in order.  A previewer given as preview
+        # -- makes the small copies of each frame once it is written, and
+        # -- write times go into the write_seconds histogram of meters.
+
+        self.out = out or sys.stdout
+        self.threaded = threaded
+        self.free = queue.Queue()
+        for n in range(0, nbufs) :
+            self.free.put(framebuf())
+        self.nbufs = nbufs
+        self.jobs = queue.Queue()
+        self.written = 0
+        self.dropped = 0
+        self.nbytes = 0
+        self.maxdepth = 0
+        self.wsum = 0.0         # seconds spent writing
+        self.wmax = 0.0
+        self.encoder = None     # videncoder that also gets every frame
+        self.unsent = 0         # lines out would not take
+        self.preview = preview
+        self.meters = meters
+        self.index = None       # indexwriter of the session being written
+        self.pack = None        # segwriter, when frames go into segments
+        self.thread = None
+        if threaded :
+            self.thread = threading.Thread(target=self._run, name="framewriter")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def get (self) :
+
+        # -- a free buffer to capture into, or None to drop the frame
+
+        try :
+            return self.free.get_nowait()
+        except queue.Empty :
+            self.dropped += 1
+            return None
+
+    def frame (self, buf, path, meta=None) :
+
+        # -- hand a filled buffer over to be written to path; meta goes
+        # -- into the frame event
+
+        buf.path = path
+        buf.meta = meta
+        self._put(('frame', buf))
+
+    def line (self, text) :
+        self._put(('line', text))
+
+    def call (self, fn) :
+
+        # -- run fn on the writer's thread, after what is queued so far
+        self._put(('call', fn))
+
+    def packto (self, dirname) :
+
+        # -- frames queued from here on go into segments in dirname rather
+        # -- than files of their own, or back to files
+        self._put(('pack', dirname))
+
+    def indexto (self, path) :
+
+        # -- frames queued from here on get a record in the index at path,
+        # -- or in none
+        self._put(('index', path))
+
+    def encode (self, encoder) :
+
+        # -- frames queued from here on also go to encoder (or nowhere)
+        self._put(('encoder', encoder))
+
+    def _put (self, job) :
+
+        if not self.threaded :
+            self._do(job)
+            return
+        self.jobs.put(job)
+        depth = self.jobs.qsize()
+        if depth > self.maxdepth :
+            self.maxdepth = depth
+
+    def _do (self, job) :
+
+        kind, arg = job
+        if kind == 'frame' :
+            t0 = time.time()
+            meta = dict(arg.meta or {})
+            if self.pack is not None :
+                seg, offset = self.pack.append(arg.view(), os.path.basename(arg.path),
+                                               meta.get('seq', 0), meta.get('t', 0.0))
+                meta['seg'] = seg
+                meta['offset'] = offset
+            else :
+                fh = open(arg.path, 'wb')
+                fh.write(arg.view())
+                fh.close()
+            dt = time.time() - t0
+            self.wsum += dt
+            if dt > self.wmax :
+                self.wmax = dt
+            if self.meters is not None :
+                self.meters.observe('write_seconds', dt)
+            self.written += 1
+            self.nbytes += arg.length
+            if self.preview is not None :
+                try :
+                    meta.update(self.preview.make(arg.view(), arg.path, self.pack is None))
+                except (IOError, OSError) as e :
+                    sys.stderr.write("framewriter: preview: %s\n" % e)
+            if self.index is not None :
+                self.index.append(meta.get('t', 0.0), meta.get('seq', 0), arg.length,
+                                  meta.get('exposure', 0), meta.get('awb', (0.0, 0.0)),
+                                  meta.get('iso', 0))
+            if self.encoder is not None :
+                self.encoder.feed(arg.view().tobytes(), (arg.meta or {}).get('t'))
+            self._emit(events.encode('frame', path=arg.path, size=arg.length, **meta))
+            arg.reset()
+            self.free.put(arg)
+        elif kind == 'encoder' :
+            self.encoder = arg
+        elif kind == 'call' :
+            arg()
+        elif kind == 'pack' :
+            if self.pack is not None :
+                self.pack.close()
+            self.pack = None
+            if arg is not None :
+                self.pack = segwriter(arg)
+        elif kind == 'index' :
+            if self.index is not None :
+                self.index.close()
+            self.index = None
+            if arg is not None :
+                self.index = indexwriter(arg)
+        else :
+            self._emit(arg)
+
+    def _emit (self, text) :
+
+        # -- a line for out; a reader gone away must not cost the card,
+        # -- the index or the video their frames
+
+        try :
+            self.out.write(text)
+            self.out.flush()
+        except (IOError, OSError) as e :
+            if not self.unsent :
+                sys.stderr.write("framewriter: out: %s\n" % e)
+            self.unsent += 1
+
+    def _run (self) :
+
+        while True :
+            job = self.jobs.get()
+            if job is None :
+                self.jobs.task_done()
+                break
+            try :
+                self._do(job)
+            except (IOError, OSError) as e :
+                sys.stderr.write("framewriter: %s\n" % e)
+                if job[0] == 'frame' :
+                    job[1].reset()
+                    self.free.put(job[1])
+            self.jobs.task_done()
+
+    def depth (self) :
+        return self.jobs.qsize()
+
+    def drain (self) :
+
+        # -- wait for everything queued so far to be written
+        if self.threaded :
+            self.jobs.join()
+
+    def stop (self) :
+
+        if self.thread is not None :
+            self.jobs.put(None)
+            self.thread.join()
+        self.thread = None
+
+    def stats (self) :
+
+        avg = self.wsum / max(1, self.written)
+        return "written=%d dropped=%d maxdepth=%d write avg=%0.1fms max=%0.1fms" % (
+            self.written, self.dropped, self.maxdepth, avg * 1000, self.wmax * 1000)
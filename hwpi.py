@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import fcntl
+import select
+import time
+
+try :
+    monotime = time.monotonic
+except AttributeError :
+    # -- python 2 has no monotonic clock; ask librt for CLOCK_MONOTONIC
+    import ctypes
+
+    class _timespec (ctypes.Structure) :
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    _librt = ctypes.CDLL('librt.so.1', use_errno=True)
+
+    def monotime () :
+        ts = _timespec()
+        if _librt.clock_gettime(1, ctypes.byref(ts)) != 0 :
+            raise OSError(ctypes.get_errno(), "clock_gettime")
+        return ts.tv_sec + ts.tv_nsec * 1e-9
+
+################################################################################
+# -- pihw class; the real hardware: GPIO, character LCD and Pi camera
+################################################################################
+
+class pihw :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 10:31:15 $"
+
+    threads = True      # background work may run on threads of its own
+
+    def __init__ (self) :
+
+        # -- hardware modules only exist on the Pi, so import them here
+
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        GPIO.setmode(GPIO.BCM)
+
+        # -- edge callbacks poke a pipe so wait() can block in select()
+        self.wakeup, self.waker = os.pipe()
+        fl = fcntl.fcntl(self.waker, fcntl.F_GETFL)
+        fcntl.fcntl(self.waker, fcntl.F_SETFL, fl | os.O_NONBLOCK)
+
+    def setup_input (self, pin) :
+        self.GPIO.setup(pin, self.GPIO.IN)
+
+    def setup_output (self, pin) :
+        self.GPIO.setup(pin, self.GPIO.OUT)
+
+    def input (self, pin) :
+        return self.GPIO.input(pin)
+
+    def output (self, pin, value) :
+        self.GPIO.output(pin, value)
+
+    def watch (self, pin, callback) :
+
+        # -- callback(pin, level, time) runs on the RPi.GPIO thread
+
+        def edge (channel) :
+            callback(channel, self.GPIO.input(channel), monotime())
+            self.poke()
+        self.GPIO.add_event_detect(pin, self.GPIO.BOTH, callback=edge)
+
+    def poke (self) :
+
+        # -- wake wait() from another thread or process
+        try :
+            os.write(self.waker, b'!')
+        except OSError :
+            pass            # pipe full, a wakeup is pending anyway
+
+    def wait (self, timeout) :
+
+        # -- block until an edge callback fires, something pokes, or
+        # -- timeout seconds pass
+
+        r, w, x = select.select([self.wakeup], [], [], max(0, timeout))
+        if r :
+            os.read(self.wakeup, 512)
+
+    def lcd (self, rs, en, d4, d5, d6, d7, cols, rows, backlight) :
+
+        import Adafruit_CharLCD as LCD
+        return LCD.Adafruit_CharLCD(rs, en, d4, d5, d6, d7, cols, rows, backlight)
+
+    def camera (self) :
+
+        from picamera import PiCamera
+        return PiCamera()
+
+    def time (self) :
+        return time.time()
+
+    def monotonic (self) :
+        return monotime()
+
+    def sleep (self, sec) :
+        time.sleep(sec)
+
+    def alive (self) :
+        return True
+
+    def probe (self, event, *args) :
+
+        # -- timing hook for the simulator; nothing to do on the Pi
+        return
+
+    def shutdown (self) :
+
+        # -- may require running as root
+        os.system("shutdown -h now")
+
+    def cleanup (self) :
+        self.GPIO.cleanup()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import time
+
+from fakecamera import fakecamera
+
+try :
+    cputime = time.process_time
+except AttributeError :
+    cputime = time.clock        # python 2
+
+################################################################################
+# -- simlcd class; a 16x2 character display that only remembers its contents
+################################################################################
+
+class simlcd :
+
+    def __init__ (self, cols, rows) :
+
+        self.cols = cols
+        self.rows = rows
+        self.col = 0
+        self.row = 0
+        self.chars = 0          # characters sent to the display
+        self.enabled = False
+        self.clear ()
+
+    def clear (self) :
+
+        self.screen = [[' '] * self.cols for r in range (0, self.rows)]
+        self.col = 0
+        self.row = 0
+
+    def enable_display (self, enable) :
+        self.enabled = enable
+
+    def set_cursor (self, col, row) :
+
+        self.col = col
+        self.row = min (row, self.rows - 1)
+
+    def message (self, text) :
+
+        for ch in text :
+            if ch == '\n' :
+                self.set_cursor (0, self.row + 1)
+                continue
+            if self.col < self.cols :
+                self.screen[self.row][self.col] = ch
+            self.col += 1
+            self.chars += 1
+
+    def lines (self) :
+        return [''.join (r) for r in self.screen]
+
+################################################################################
+# -- simhw class; replays scripted pin changes against a virtual clock
+################################################################################
+
+class simhw :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 10:31:15 $"
+
+    threads = False     # real threads cannot keep pace with the virtual clock
+
+    def __init__ (self, hours=1.0, epoch=None) :
+
+        # -- the clock starts at epoch (default: now) and time passes only
+        # -- when the code under test sleeps, so hours run in seconds
+
+        self.epoch = epoch or time.time ()
+        self.now = 0.0
+        self.end = hours * 3600.0
+        self.events = []
+        self.pins = {}
+        self.watchers = {}
+        self.outputs = {}
+        self.halted = False
+        self.cameras = 0
+        self.framebytes = 0.001  # keeps synthetic frames small
+        self.loops = []         # (virtual period, cpu seconds)
+        self.late = []          # capture lateness in seconds
+        self.sessions = []      # capsched of each finished session
+        self.stalls = []        # (virtual second, extra) camera stalls
+        self._lastloop = None
+        self._lastcpu = None
+        self.display = None
+
+    # -- script ---------------------------------------------------------------
+
+    def event (self, at, pin, level) :
+
+        # -- set input pin to level at virtual second at
+
+        self.events.append ((at, pin, level))
+        self.events.sort (key=lambda e: e[0])
+
+    def load (self, path) :
+
+        # -- script lines are "seconds pin level"; # starts a comment
+
+        fh = open (path)
+        for line in fh :
+            line = line.split ('#')[0].split ()
+            if len (line) == 3 :
+                self.event (float (line[0]), int (line[1]), int (line[2]) )
+        fh.close ()
+
+    def _replay (self) :
+
+        while self.events and self.events[0][0] <= self.now :
+            at, pin, level = self.events.pop (0)
+            if self.pins.get (pin, 1) == level :
+                continue
+            self.pins[pin] = level
+            if pin in self.watchers :
+                self.watchers[pin] (pin, level, at)
+
+    # -- hardware -------------------------------------------------------------
+
+    def setup_input (self, pin) :
+        self.pins.setdefault (pin, 1)       # inputs idle high
+
+    def setup_output (self, pin) :
+        self.outputs[pin] = 0
+
+    def input (self, pin) :
+        return self.pins.get (pin, 1)
+
+    def output (self, pin, value) :
+        self.outputs[pin] = value
+
+    def watch (self, pin, callback) :
+        self.watchers[pin] = callback
+
+    def wait (self, timeout) :
+
+        # -- jump ahead to the next scripted pin change or the timeout
+
+        until = self.now + max (0, timeout)
+        if self.events and self.events[0][0] < until :
+            until = self.events[0][0]
+        self.now = max (self.now, until)
+        self._replay ()
+
+    def lcd (self, rs, en, d4, d5, d6, d7, cols, rows, backlight) :
+
+        self.display = simlcd (cols, rows)
+        return self.display
+
+    def camera (self) :
+
+        self.cameras += 1
+        cam = fakecamera (sleeper=self._camsleep)
+        cam.bytesper = self.framebytes
+        return cam
+
+    def stall (self, at, sec) :
+
+        # -- the first camera delay at or after virtual second at takes
+        # -- sec longer, as a capture that hangs on the sensor would
+
+        self.stalls.append ((at, sec))
+        self.stalls.sort ()
+
+    def _camsleep (self, sec) :
+
+        if self.stalls and self.stalls[0][0] <= self.now :
+            sec += self.stalls.pop (0)[1]
+        self.sleep (sec)
+
+    def time (self) :
+        return self.epoch + self.now
+
+    def monotonic (self) :
+        return self.now
+
+    def sleep (self, sec) :
+
+        if sec > 0 :
+            self.now += sec
+        self._replay ()
+
+    def alive (self) :
+        return self.now < self.end and not self.halted
+
+    def probe (self, event, *args) :
+
+        if event == 'loop' :
+            cpu = cputime ()
+            if self._lastloop is not None :
+                self.loops.append ((self.now - self._lastloop, cpu - self._lastcpu) )
+            self._lastloop = self.now
+            self._lastcpu = cpu
+        elif event == 'capture' :
+            self.late.append (self.now - args[0])
+        elif event == 'end' :
+            self.sessions.append (args[0])
+
+    def shutdown (self) :
+        self.halted = True
+
+    def cleanup (self) :
+        return
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+try :
+    import queue
+except ImportError :
+    import Queue as queue       # python 2
+
+################################################################################
+# -- inputq class; buttons and the BCD wheel fed by GPIO edge callbacks
+################################################################################
+
+class inputq :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 11:20:47 $"
+
+    def __init__ (self, hw, butpins, bcdpins, bcdcode, debounce, sec) :
+
+        # -- buttons are negative logic; the wheel reads as one of bcdcode,
+        # -- where code 0 means 10 seconds.  sec is the fallback wheel value.
+
+        self.hw = hw
+        self.butpins = butpins
+        self.bcdpins = bcdpins
+        self.debounce = debounce
+        self.events = queue.Queue()
+        self.level = {}         # debounced pin levels
+        self.changed = {}       # when each pin last changed level
+        self.recheck = {}       # pins that bounced, and when to read them again
+        self.press = [0] * len(butpins)
+        self.rele = [0] * len(butpins)
+        self.codes = {}
+        for v in range(0, len(bcdcode)) :
+            self.codes[tuple(bcdcode[v])] = v or 10
+
+        now = hw.monotonic()
+        for pin in butpins + bcdpins :
+            self.level[pin] = hw.input(pin)
+            self.changed[pin] = now - debounce
+            hw.watch(pin, self._edge)
+        self.sec = self.codes.get(self._bcd(), sec)
+
+    def _edge (self, pin, level, at) :
+
+        # -- called from the GPIO thread on the Pi; just queue it
+        self.events.put((pin, level, at))
+
+    def _bcd (self) :
+        return tuple([self.level[p] for p in self.bcdpins])
+
+    def _apply (self, pin, level, at) :
+
+        if level == self.level[pin] :
+            return
+        if at - self.changed[pin] < self.debounce :
+            # -- bouncing; look at the pin again once it has settled
+            self.recheck[pin] = self.changed[pin] + self.debounce
+            return
+        self.level[pin] = level
+        self.changed[pin] = at
+        if pin in self.butpins :
+            bx = self.butpins.index(pin)
+            if level == 0 :
+                self.press[bx] = 1
+            else :
+                self.rele[bx] = 1
+        else :
+            self.sec = self.codes.get(self._bcd(), self.sec)
+
+    def wait (self, timeout) :
+
+        # -- sleep until an edge arrives or timeout seconds pass
+
+        if self.events.empty() :
+            self.hw.wait(timeout)
+
+    def scan (self, now) :
+
+        # -- fold queued edges into press/release flags for this pass; a
+        # -- press and its release can both land in one pass
+
+        for bx in range(0, len(self.butpins)) :
+            self.press[bx] = 0
+            self.rele[bx] = 0
+        while True :
+            try :
+                pin, level, at = self.events.get_nowait()
+            except queue.Empty :
+                break
+            self._apply(pin, level, at)
+        for pin, at in list(self.recheck.items()) :
+            if now >= at :
+                del self.recheck[pin]
+                self._apply(pin, self.hw.input(pin), now)
+
+    def deadline (self) :
+
+        # -- when scan next needs to run for a bouncing pin, or None
+
+        if not self.recheck :
+            return None
+        return min(self.recheck.values())
+
+    def down (self, but) :
+        return self.level[self.butpins[but]] == 0
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+################################################################################
+# -- lcdbuf class; framebuffer in front of the character LCD
+################################################################################
+
+class lcdbuf :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 12:48:09 $"
+
+    def __init__ (self, lcd, cols, rows, minperiod=0.25) :
+
+        # -- lcd is anything with set_cursor, message and clear, like
+        # -- Adafruit_CharLCD.  Unforced refreshes come at most once every
+        # -- minperiod seconds.
+
+        self.lcd = lcd
+        self.cols = cols
+        self.rows = rows
+        self.minperiod = minperiod
+        self.want = [[' '] * cols for r in range (0, rows)]
+        self.shown = [[' '] * cols for r in range (0, rows)]
+        self.lastflush = None
+        self.written = 0        # bytes sent: characters plus cursor moves
+        self.naive = 0          # what rewriting whole padded lines would send
+        self.flushes = 0
+        self.deferred = 0
+
+    def line (self, row, text) :
+
+        # -- put text on row (0 based), padded or cut to the width
+
+        if row < 0 or row >= self.rows :
+            return
+        text = (text + ' ' * self.cols)[0:self.cols]
+        self.want[row] = list (text)
+        self.naive += 1 + 32    # set_cursor plus the old 32 character pad
+
+    def clear (self) :
+
+        self.lcd.clear ()
+        self.written += 1
+        for r in range (0, self.rows) :
+            self.want[r] = [' '] * self.cols
+            self.shown[r] = [' '] * self.cols
+
+    def pending (self) :
+        return self.want != self.shown
+
+    def deadline (self) :
+
+        # -- when a deferred refresh may go out, or None
+
+        if not self.pending () :
+            return None
+        if self.lastflush is None :
+            return 0.0
+        return self.lastflush + self.minperiod
+
+    def flush (self, now, force=False) :
+
+        # -- send only the cells that differ.  Runs separated by a single
+        # -- unchanged cell are joined: rewriting it costs the same as a
+        # -- cursor move.
+
+        if not self.pending () :
+            return
+        # -- compared as deadline() works it out, so a wake at the deadline
+        # -- is never a hair early
+        if not force and self.lastflush is not None and now < self.lastflush + self.minperiod :
+            self.deferred += 1
+            return
+        for r in range (0, self.rows) :
+            want = self.want[r]
+            shown = self.shown[r]
+            c = 0
+            while c < self.cols :
+                if want[c] == shown[c] :
+                    c += 1
+                    continue
+                end = c + 1
+                while end < self.cols :
+                    if want[end] != shown[end] :
+                        end += 1
+                    elif end + 1 < self.cols and want[end + 1] != shown[end + 1] :
+                        end += 2
+                    else :
+                        break
+                self.lcd.set_cursor (c, r)
+                self.lcd.message (''.join (want[c:end]))
+                self.written += 1 + (end - c)
+                shown[c:end] = want[c:end]
+                c = end
+        self.lastflush = now
+        self.flushes += 1
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import bisect
+
+# -- bucket bounds in seconds, from half a millisecond to five seconds
+
+LATENCY = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+################################################################################
+# -- histogram class; cumulative buckets as Prometheus keeps them
+################################################################################
+
+class histogram :
+
+    def __init__ (self, bounds=LATENCY) :
+
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # the last is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.base = [0] * len(self.counts)      # counts as of mark()
+
+    def mark (self) :
+
+        # -- start a window for quantile(p, True); the buckets themselves
+        # -- stay cumulative, as Prometheus needs them
+
+        self.base = list(self.counts)
+
+    def observe (self, v) :
+
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile (self, p, marked=False) :
+
+        # -- upper bound of the bucket holding the p'th quantile; good
+        # -- enough to see where the time goes.  marked counts only what
+        # -- was observed since mark()
+
+        counts = self.counts
+        if marked :
+            counts = [n - b for n, b in zip(self.counts, self.base)]
+        count = sum(counts)
+        if count == 0 :
+            return 0.0
+        want = p * count
+        seen = 0
+        for ix, n in enumerate(counts) :
+            seen += n
+            if seen >= want :
+                return self.bounds[ix] if ix < len(self.bounds) else float('inf')
+        return float('inf')
+
+################################################################################
+# -- metrics class; histograms, counters and gauges, written as a text file
+################################################################################
+
+class metrics :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 20:31:55 $"
+
+    def __init__ (self, path, period=15.0, prefix="pilapse_") :
+
+        # -- path is rewritten, in Prometheus text exposition format, at
+        # -- most every period seconds; node_exporter's textfile collector
+        # -- picks it up from there
+
+        self.path = path
+        self.period = period
+        self.prefix = prefix
+        self.order = []
+        self.help = {}
+        self.kind = {}
+        self.values = {}
+        self.next = 0.0
+
+    def _add (self, name, kind, help, value) :
+
+        self.order.append(name)
+        self.kind[name] = kind
+        self.help[name] = help
+        self.values[name] = value
+
+    def histogram (self, name, help, bounds=LATENCY) :
+        self._add(name, 'histogram', help, histogram(bounds))
+
+    def counter (self, name, help) :
+        self._add(name, 'counter', help, 0)
+
+    def gauge (self, name, help) :
+        self._add(name, 'gauge', help, 0)
+
+    def observe (self, name, v) :
+        self.values[name].observe(v)
+
+    def inc (self, name, n=1) :
+        self.values[name] += n
+
+    def set (self, name, v) :
+        self.values[name] = v
+
+    def get (self, name) :
+        return self.values[name]
+
+    def quantile (self, name, p, marked=False) :
+        return self.values[name].quantile(p, marked)
+
+    def mark (self) :
+
+        # -- a new window for the quantiles of every histogram
+
+        for name in self.order :
+            if self.kind[name] == 'histogram' :
+                self.values[name].mark()
+
+    def due (self, now) :
+
+        # -- is it time to write the file again
+
+        if now < self.next :
+            return False
+        self.next = now + self.period
+        return True
+
+    def deadline (self) :
+        return self.next
+
+    def render (self) :
+
+        lines = []
+        for name in self.order :
+            full = self.prefix + name
+            lines.append("# HELP %s %s" % (full, self.help[name]))
+            lines.append("# TYPE %s %s" % (full, self.kind[name]))
+            v = self.values[name]
+            if self.kind[name] != 'histogram' :
+                lines.append("%s %.17g" % (full, v))
+                continue
+            seen = 0
+            for bound, n in zip(v.bounds, v.counts) :
+                seen += n
+                lines.append('%s_bucket{le="%s"} %d' % (full, repr(bound), seen))
+            lines.append('%s_bucket{le="+Inf"} %d' % (full, v.count))
+            lines.append("%s_sum %s" % (full, repr(v.sum)))
+            lines.append("%s_count %d" % (full, v.count))
+        return "\n".join(lines) + "\n"
+
+    def write (self, text=None) :
+
+        # -- replace the file in one rename, so a scrape never sees half
+
+        text = text if text is not None else self.render()
+        try :
+            fh = open(self.path + ".tmp", "w")
+            fh.write(text)
+            fh.close()
+            os.rename(self.path + ".tmp", self.path)
+        except (IOError, OSError) :
+            pass        # metrics are never worth stopping for
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+################################################################################
+# -- pacer class; frame interval that follows how much the scene changes
+################################################################################
+
+class pacer :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 17:40:12 $"
+
+    def __init__ (self, floor, ratio=8, busy=2.0, calm=0.5) :
+
+        # -- floor is the shortest interval in seconds and the ceiling
+        # -- is ratio times that.  A change of busy percent or more
+        # -- between frames halves the interval at once; under calm
+        # -- percent it backs off by a quarter a frame.  In between it
+        # -- holds.
+
+        self.ratio = ratio
+        self.busy = busy
+        self.calm = calm
+        self.floor = float (floor)
+        self.interval = self.floor
+        self.faster = 0
+        self.slower = 0
+
+    def bounds (self, floor) :
+
+        # -- new floor, as when the wheel is turned mid-session
+
+        self.floor = float (floor)
+        self.interval = min (max (self.interval, self.floor), self.floor * self.ratio)
+
+    def update (self, diff) :
+
+        # -- the interval to use after a frame that changed by diff
+
+        if diff >= self.busy :
+            interval = max (self.floor, self.interval / 2)
+        elif diff < self.calm :
+            interval = min (self.floor * self.ratio, self.interval * 1.25)
+        else :
+            interval = self.interval
+        if interval < self.interval :
+            self.faster += 1
+        elif interval > self.interval :
+            self.slower += 1
+        self.interval = interval
+        return interval
+
+    def stats (self) :
+        return "interval=%0.2f floor=%0.2f faster=%d slower=%d" % (
+            self.interval, self.floor, self.faster, self.slower)
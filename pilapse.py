@@ -31,26 +31,59 @@ VERDATE = "$Date: 2019/06/23 18:12:57 $"
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #-------------------------------------------------------------------------------
 
-from picamera import PiCamera
 from datetime import datetime
-import signal, os
-import time
+import os
 import sys
+import getopt
 
 from submenu import submenu
-
-import RPi.GPIO as GPIO
-import Adafruit_GPIO.SPI as SPI
-import Adafruit_CharLCD as LCD
+from capsession import capsession
+from inputq import inputq
+from capsched import capsched
+from lcdbuf import lcdbuf
+from storemon import storemon
+from sesscat import sesscat
+from framewriter import framewriter
+from frameindex import frameindex, INDEXFILE
+import segstore
+from metrics import metrics
+from retention import retention
+from videncoder import videncoder
+from pacer import pacer
+from snapshot import snapshot
+from engine import localengine, engineproc
+import events
+
+# -- framediff, deflicker, clockface and preview pull in numpy or PIL, which
+# -- take seconds to import on a Pi Zero; they are imported when first used
 
 #-- CONSTANTS ------------------------------------------------------------------
 
 LAPSDIR = "/var/lapse"
 FILEFMT = "image-%Y%m%dT%H%M%S.jpg"
+FILEFMT_SUB = "image-%Y%m%dT%H%M%S.%f.jpg"  # when two frames may share a second
 PATHFMT = LAPSDIR + "/D%0.4d/%s"
+VIDFMT  = LAPSDIR + "/VIDEO/lapse-%0.4d.mp4"
 HALTSPAN = 4    # hold duration for graceful shutdown
 FLASHSEC = 0.20 # seconds to flash the led when taking a picture
-SLEEPSEC = 0.05 # loop granularity
+SLEEPSEC = 0.05 # first pass, and how late a deadline may be met
+LCDSEC   = 0.25 # least time between status refreshes of the LCD
+DISKSEC  = 30   # how often the storage monitor samples free space
+RESERVE  = 64*1024*1024 # bytes of card kept free for the OS and the mp4
+KEEPFREE = 1024**3  # old sessions are evicted below this, if asked to
+BUFFERS  = 4    # frames that may wait in memory for the card
+ENCDEPTH = 8    # frames that may wait in memory for the encoder
+STILLKEEP = 10  # keep one in this many unchanged frames; 0 drops them all
+STACKSIGMA = 3.0    # Clip leaves out pixels this many noise widths off
+CLOCKSIZE = 50  # clock overlay diameter in pixels
+CLOCKCOLOR = '#ffffff'
+PREVIEWPX = 640 # longest side of the preview made of every frame
+THUMBPX  = 160  # and of the thumbnail on the contact sheets
+METRICSSEC = 15 # least time between rewrites of the metrics file
+DIAGSEC  = 1    # refresh of the Diagnostics page while it is showing
+ENCODER  = "/usr/bin/nice /usr/local/bin/ffmpeg -loglevel 0 -y -f image2pipe -vcodec mjpeg -r {fps} -i - -vcodec mpeg4 -qscale 5 -r {fps} -f mp4 {vidpath}"
+DEBOUNCE = 0.02 # seconds a pin must hold a level to count
+IDLESEC  = 60   # longest sleep with nothing scheduled
 
 #- 16x2 character LCD pin configuration:
 
@@ -87,19 +120,44 @@ ledpin = 14
 
 maxct = 99
 takepic = False
-sperf   = 3   # seconds per frame default, but will read wheel
+sperf   = 3   # seconds per frame default, but will read wheel and stepx
 
 butpins     = [12, 5, 6]
-butstate    = [0, 0, 0] # unpressed
-butpress    = [0, 0, 0] # just pressed
-butrele     = [0, 0, 0] # just released
+
+hw  = None  # hardware backend, pihw on the camera or simhw for testing
+lcd = None
+lcdb = None     # lcdbuf holding what is on the LCD
+store = None    # storemon watching free space on LAPSDIR
+keeper = None   # retention evicting old sessions in Repeat & evict
+sessions = None # sesscat of the D#### directories
+writer = None   # framewriter putting frames on the card, and lines on stdout
+previews = None # previewer making the small copies, if PIL is there
+meters  = None  # metrics of the loop, capture and writes
+snap    = None  # snapshot of the menus and recording state, kept on the card
+metricsfile = None  # where they go; LAPSDIR/metrics.prom unless -M
+encoder = None  # videncoder of the session being recorded in V, B or N mode
+sched   = None  # capsched of the session being recorded
+stills  = None  # framediff leaving out unchanged frames, if asked for
+pace    = None  # pacer choosing the interval in the Adaptive pace
+night   = None  # stacker merging each Night burst into one frame
+encoders = []   # every videncoder started, some maybe still finishing
+inputs = None   # inputq of button and wheel edges
+engine = None   # localengine or engineproc doing the capturing
+wheelsec = sperf    # the wheel as the UI last read it
+
+# -- the engine's side of a recording
+cam     = None  # capsession held open from start to end
+dirnum  = 0     # session being recorded, or the last one
+sessend = 0     # when it has been recorded for reclen
+framecount = 0
+sbytes  = 0
+why     = ''    # why the last session ended; one of engine.WHY
 
 
 #-- functions ------------------------------------------------------------------
 
-def diskfree_str(path) :
+def diskfree_str(fbytes) :
 
-    fbytes = diskfree(path)
     fkbytes = fbytes / 1024
     fmbytes = fkbytes / 1024
     fgbytes = fmbytes / 1024
@@ -112,81 +170,74 @@ def diskfree_str(path) :
         return "%d K" % fkbytes
     return "%d B" % fbytes
 
+
 # --
 
-def diskfree (path) :
-    
-    dstat = os.statvfs(path)
-    return dstat.f_bsize * dstat.f_bavail
+def filect (dir) :
+
+    # frames in a session directory; from its index when it has one
+    try :
+        idx = frameindex (dir)
+    except (IOError, OSError) :
+        return len (os.listdir(dir) )
+    count = len (idx)
+    idx.close ()
+    return count
 
 # --
 
-def filect (dir) :
+def set_lapsdir (path) :
 
-    return len (os.listdir(dir) )
+    global LAPSDIR, PATHFMT, VIDFMT
+    LAPSDIR = path
+    PATHFMT = LAPSDIR + "/D%0.4d/%s"
+    VIDFMT  = LAPSDIR + "/VIDEO/lapse-%0.4d.mp4"
 
 # --
 
 def button_init () :
 
-    GPIO.setmode(GPIO.BCM)
+    global inputs
     for b in butpins :
-        GPIO.setup(b, GPIO.IN)
+        hw.setup_input(b)
     for b in bcdpins :
-        GPIO.setup(b, GPIO.IN)
+        hw.setup_input(b)
+    inputs = inputq (hw, butpins, bcdpins, bcdcode, DEBOUNCE, sperf)
 
 # --
 
 def led_on () :
-    GPIO.output (ledpin, 1)
+    hw.output (ledpin, 1)
 
 def led_off () :
-    GPIO.output (ledpin, 0)
+    hw.output (ledpin, 0)
 
 def led_init () :
-    GPIO.setup(ledpin, GPIO.OUT)
+    hw.setup_output(ledpin)
     led_off () ;
 
 # --
 
 def button_down (but) :
 
-    # negative logic on buttons
+    # debounced level from the edge queue
     if but >= len(butpins) :
         return False
-    bs = GPIO.input(butpins[but])
-    if bs == False :
-        return True
-    else :
-        return False
+    return inputs.down(but)
 
 # --
 
 def button_scan ():
 
-    # track button state
+    # take in the edges queued since the last pass
 
-    for bx in range (0, len(butpins) ) :
-        bstate = button_down (bx)
-        if bstate :
-            if butstate[bx] == 0 :
-                butpress[bx] = 1
-            else :
-                butpress[bx] = 0
-            butrele[bx] = 0
-        else :
-            if butstate[bx] != 0 :
-                butrele[bx] = 1
-            else :
-                butrele[bx] = 0
-            butpress[bx] = 0
-        butstate[bx] = bstate
+    inputs.scan(hw.monotonic())
 
 # --
 
 def button_press (but) :
     if but < len(butpins)  :
-            return butpress[but]
+            return inputs.press[but]
     return 0
 
 # --
@@ -196,21 +247,68 @@ def button_press (but) :
 
 def button_release (but) :
     if but < len(butpins)  :
-            return butrele[but]
+            return inputs.rele[but]
     return 0
 
 # --
 
+def metrics_init (path) :
+
+    # the histograms and counters pilapse.py keeps, written to path
+    m = metrics (path, METRICSSEC)
+    m.histogram ('loop_seconds', "Capture engine pass, wakeup to sleep")
+    m.histogram ('capture_seconds', "Time to capture one frame")
+    m.histogram ('write_seconds', "Time to write one frame to the card")
+    m.histogram ('lcd_seconds', "Time to send changes to the LCD")
+    m.histogram ('slip_seconds', "How long after its deadline a capture started")
+    m.histogram ('stack_seconds', "Time to merge a night burst into one frame")
+    m.counter ('frames_total', "Frames captured")
+    m.counter ('dropped_total', "Frames dropped with every buffer waiting on the card")
+    m.counter ('still_total', "Frames left out as unchanged")
+    m.counter ('bytes_total', "Bytes of JPEG captured")
+    m.gauge ('free_bytes', "Free space on the card")
+    m.gauge ('writer_depth', "Jobs waiting for the writer thread")
+    m.gauge ('recording', "1 while a session is recording")
+    m.gauge ('boot_seconds', "Time from start to the ready screen")
+    return m
+
+# --
+
+def ms_str (sec) :
+
+    # a latency in a few characters
+    if sec == float('inf') :
+        return "inf"
+    if sec < 0.001 :
+        return "%0.1fms" % (sec * 1000)
+    if sec < 1 :
+        return "%dms" % (sec * 1000)
+    return "%ds" % sec
+
+# --
+
+def diag_line (st) :
+
+    # line 2 of the Diagnostics page picked, from the engine's status
+    prompt, name = diag.current()
+    if name == 'counts' :
+        return ("F%d D%d S%d" % (st['shots'], st['dropped'], st['stills']))[0:16]
+    return "%-6s %9s" % (prompt, "p99 " + ms_str(st[name]))
+
+# --
+
 def lcd_line (line, string) :
 
-    s32 = "                                "
-    if line < 0 or line > 2 :
+    # only changes the buffer; lcd_flush sends what differs
+    if line < 1 or line > 2 :
             return
-    lcd.set_cursor(0,(line - 1) )
-    if len(string) < 32 :
-        lcd.message (string+s32[len(string):])
-    else :
-        lcd.message (string[0:32])
+    lcdb.line (line - 1, string)
+
+# --
+
+def lcd_flush (force=False) :
+
+    lcdb.flush (hw.monotonic(), force)
 
 # --
 
@@ -220,17 +318,25 @@ def lcd_2lines (l1, l2) :
 
 # --
 
-def lcd_space (lcd, state, dir, count) :
+def lcd_space (lcd, st) :
 
-    if state :
-        line1 = "# %d" % (count)
+    # the status screen, from the engine's status
+    if st['recording'] :
+        line1 = "# %d" % (st['frames'])
         line1 = line1[0:11]
-        line1 = "%-11s%5s" % (line1, diskfree_str(LAPSDIR) ) 
-        line2 = "D%0.4d %9ds" % (dir, sperf)
+        line1 = "%-11s%5s" % (line1, diskfree_str(st['free']) ) 
+        if modes.value() == 'B' :
+            # achieved against requested, so a card that can't keep up shows
+            line2 = "D%0.4d %4.1f/%-2dfps" % (st['dirnum'], st['rate'], burst.value())
+        else :
+            line2 = "D%0.4d %4s %5s" % (st['dirnum'], interval_str(st['interval']),
+                                        left_str(st['left']))
     else :
         stmsg = "OFF"
-        line1 = "%16s" % (diskfree_str(LAPSDIR) )
-        line2 = "%-9.9s%7s" % (resolutions.value(), "OFF")
+        if st['why'] == 'Card full' :
+            stmsg = "FULL"
+        line1 = "%16s" % (diskfree_str(st['free']) )
+        line2 = "%-9.9s%7s" % (resolutions.value(), stmsg)
 
 
     lcd_2lines (line1, line2)
@@ -239,44 +345,440 @@ def lcd_space (lcd, state, dir, count) :
 
 def read_sec () :
 
-    bcd = [0,0,0,0]
-    for bx in range(0,len(bcdpins)) :
-        bs = GPIO.input(bcdpins[bx])
-        bcd[bx] = bs
+    # the wheel is decoded by the UI as its pins change, and sent over
+    # when it turns; unknown codes keep the last good value
+    return wheelsec
 
-    for bx in range(0,len(bcdcode)) :
-        if bcdcode[bx] == bcd :
-            if (bx == 0) :
-                return 10
-            else :
-                return bx
+# --
 
-    return sperf # this oughtn't happen :-\
+def read_interval () :
+
+    # seconds between frames: the wheel times the interval multiplier,
+    # or whatever the burst rate asks for in B mode
+    if modes.value() == 'B' :
+        return 1.0 / burst.value()
+    return read_sec() * stepx.value()
 
 # --
 
-def next_directory (startafter) :
-    for num in range(startafter+1, 1000000) :
-        dirpath = "%s/D%0.4d" % (LAPSDIR, num)
-        try:
-            os.mkdir(dirpath, 0777)
-            return num
-        except OSError:
-            True
+def interval_str (sec) :
+
+    if sec < 10 and sec != int(sec) :
+        return "%0.1fs" % sec
+    if sec < 120 :
+        return "%ds" % sec
+    if sec < 7200 :
+        return "%dm" % (sec / 60)
+    return "%dh" % (sec / 3600)
+
+# --
+
+def left_str (sec) :
+
+    # recording time left on the card
+    if sec >= 2*dy :
+        return "%dd" % (sec / dy)
+    if sec >= 2*hr :
+        return "%dh" % (sec / hr)
+    return "%dm" % (sec / mn)
+
+# --
+
+def end_session (cam, sched, why, dirnum, nbytes) :
+
+    global encoder, stills, pace, night
+    sys.stderr.write("%s %s\n" % (why, sched.stats()))
+    flag = { 'n' : dirnum, 't' : hw.time(), 'frames' : sched.frames,
+             'late' : sched.late, 'missed' : sched.missed }
+    if stills is not None :
+        sys.stderr.write("stills %s\n" % stills.stats())
+        flag['still'] = stills.skipped
+        stills = None
+    if pace is not None :
+        sys.stderr.write("pace %s\n" % pace.stats())
+        pace = None
+    if night is not None :
+        sys.stderr.write("stack %s\n" % night.stats())
+        flag['stack'] = night.frames
+        night = None
+    if cam.frames is not None :
+        flag['rate'] = round(sched.rate(), 2)
+        flag['dropped'] = sched.dropped
+        sys.stderr.write("burst %0.2f of %0.2f fps\n" % (sched.rate(), 1.0 / sched.interval))
+    writer.line(events.encode('end', **flag))
+    writer.encode(None)
+    writer.indexto(None)
+    writer.packto(None)
+    if previews is not None :
+        writer.call(previews.close)
+    writer.drain()
+    sys.stderr.write("writer %s\n" % writer.stats())
+    if encoder is not None :
+        # the mp4 is finished off in the background
+        sys.stderr.write("encoder %s\n" % encoder.stats())
+        encoder.finish()
+        encoder = None
+    hw.probe ('end', sched)
+    cam.stop()
+    sessions.end (dirnum, sched.frames, nbytes, sched.late, sched.missed, hw.time())
+
+# --
+
+def start_encoder (vidpath, rate, window=0, gravity=None) :
+
+    # encoder subprocess for a V or B mode session, or None if it won't start.
+    # With a window, frames are deflickered over that many on the way in;
+    # with a gravity, a clock is put in that corner.
+    global encoder
+    flick = None
+    clock = None
+    if window :
+        try :
+            from deflicker import deflicker
+            flick = deflicker (window)
+        except ImportError as e :
+            sys.stderr.write("no deflicker: %s\n" % e)
+    if gravity :
+        try :
+            from clockface import clockface
+            clock = clockface (CLOCKSIZE, CLOCKCOLOR, gravity)
+        except ImportError as e :
+            sys.stderr.write("no clock: %s\n" % e)
+    try :
+        if not os.path.isdir(os.path.dirname(vidpath)) :
+            os.makedirs(os.path.dirname(vidpath))
+        encoder = videncoder (ENCODER, vidpath, rate, ENCDEPTH, hw.threads, flick, clock)
+    except OSError as e :
+        sys.stderr.write("no video: %s\n" % e)
+        encoder = None
+        return None
+    encoders.append(encoder)
+    writer.encode(encoder)
+    return encoder
+
+# --
+
+def next_directory () :
+
+    # the catalog remembers the last number, so this is one mkdir
+    return sessions.alloc()
+
+# --
+
+def previews_init () :
+
+    # run on the writer thread; frames before it is done get no previews
+    global previews
+    try :
+        from preview import previewer
+        previews = previewer (PREVIEWPX, THUMBPX)
+    except ImportError as e :
+        sys.stderr.write("no previews: %s\n" % e)
+        return
+    writer.preview = previews
+
+# --
+
+def start_session (cam, now) :
+
+    # a new D#### session with the camera, scheduler and encoder it needs;
+    # returns its number
+    global sperf, sched, stills, pace, night
+    dirnum = next_directory()
+    sperf = read_interval()
+    sessions.start (dirnum, resolutions.value(), sperf, hw.time())
+    meters.mark()
+    sched = capsched (sperf, overrun.value(), SLEEPSEC)
+    sched.start (now)
+    cam.start (resolutions.value(), 270, ISO.value())
+    flag = { 'n' : dirnum, 'dir' : sessions.dirpath(dirnum),
+             't' : hw.time(), 'mode' : modes.value() }
+    adapt = pacing.value() == 'adapt' and modes.value() != 'B'
+    if still.value() or adapt :
+        try :
+            from framediff import framediff
+            stills = framediff (still.value(), STILLKEEP)
+            if adapt :
+                # the wheel interval is the fastest it goes
+                pace = pacer (sperf)
+        except ImportError as e :
+            sys.stderr.write("no change detection: %s\n" % e)
+    if modes.value() == 'B' :
+        cam.stream (burst.value())
+        flag['burst'] = burst.value()
+    if modes.value() == 'N' :
+        n, how = stack.value()
+        try :
+            from stacker import stacker
+            night = stacker (resolutions.value(), n, how, STACKSIGMA)
+            flag['stack'] = n
+        except ImportError as e :
+            sys.stderr.write("no night stacking: %s\n" % e)
+    if modes.value() in ('V', 'B', 'N') :
+        # pilapse.py feeds the encoder itself now
+        vidpath = VIDFMT % dirnum
+        if start_encoder (vidpath, fps.value(), flicker.value(),
+                          clockpos.value()) :
+            flag['video'] = vidpath
+            flag['fps'] = fps.value()
+    if reclen.value() < 12*yr :
+        flag['length'] = reclen.value()
+    writer.line(events.encode('start', **flag))
+    writer.indexto(os.path.join(sessions.dirpath(dirnum), INDEXFILE))
+    if storage.value() == 'packed' :
+        writer.packto(sessions.dirpath(dirnum))
+    if cycle.value() == 2 :
+        # room for the next one is made while this one records
+        keeper.kick (dirnum)
+    return dirnum
+
+# --
+
+def settings () :
+
+    # what the engine needs of the UI to start a session
+    return { 'menus' : [m.selection for m in menus], 'sec' : wheelsec }
+
+# --
+
+def stop_session (reason) :
+
+    global takepic, framecount, sbytes, why
+    end_session (cam, sched, reason, dirnum, sbytes)
+    store.kick()
+    takepic = False
+    framecount = 0
+    sbytes = 0
+    why = reason
 
 #-------------------------------------------------------------------------------
 
-# -- initialize GPIO
+# -- The capture engine.  These run in the engine process on the Pi, and
+# -- from the main loop in the simulator; see engine.py.
+
+def engine_init () :
+
+    # the card, the catalog, the writer and the camera
+    global store, keeper, sessions, meters, writer, cam, dirnum
 
-button_init() 
-led_init()
+    # -- free space is sampled in the background, not on every refresh
 
-# -- initialize LCD
+    store = storemon (LAPSDIR, DISKSEC, RESERVE)
+    store.start()
 
-lcd = LCD.Adafruit_CharLCD(lcd_rs, lcd_en, lcd_d4, lcd_d5, lcd_d6, lcd_d7, 
-               lcd_columns, lcd_rows, lcd_backlight)
-lcd.enable_display(True)
-lcd.clear()
+    sessions = sesscat (LAPSDIR)
+    if os.path.isdir(sessions.dirpath(sessions.last)) :
+        # a packed session cut short by a power cut gets its tail back
+        segstore.recover (sessions.dirpath(sessions.last))
+    keeper = retention (sessions, store, KEEPFREE, VIDFMT, hw.threads)
+    keeper.start()
+    dirnum = sessions.last
+
+    # -- frames are captured to memory and written on another thread;
+    # -- the previewer is made there too, so PIL loads after ready
+
+    meters = metrics_init (metricsfile or os.path.join(LAPSDIR, "metrics.prom"))
+    writer = framewriter (BUFFERS, sys.stdout, hw.threads, None, meters)
+    writer.call (previews_init)
+
+    # -- one camera session per recording, held open from #VIDEO/#IMAGES to #END;
+    # -- the camera itself is not opened until then
+    cam = capsession (hw.camera)
+
+# --
+
+def engine_command (cmd, arg) :
+
+    # start and stop from the UI, with the menus as they are there
+    global takepic, framecount, sbytes, dirnum, sessend, why, wheelsec
+    now = hw.monotonic()
+    if cmd == 'start' and not takepic :
+        for menu, ix in zip (menus, arg['menus']) :
+            menu.setval (ix)
+        wheelsec = arg['sec']
+        if store.full(resolutions.value()) :
+            sys.stderr.write("Card full\n")
+            why = 'Card full'
+        else :
+            sys.stderr.write("On\n")
+            takepic = True
+            framecount = 0
+            sbytes = 0
+            why = ''
+            dirnum = start_session (cam, now)
+            sessend = now + reclen.value()
+    elif cmd == 'stop' and takepic :
+        stop_session ("Off")
+    elif cmd == 'wheel' :
+        wheelsec = arg
+    elif cmd == 'meter' :
+        # figures the UI keeps, for the metrics file
+        method, name, values = arg
+        for v in values :
+            getattr (meters, method) (name, v)
+    elif cmd == 'save' :
+        # the UI's snapshot state; the card is written on the writer thread
+        snap.state = arg
+        writer.call (snap.save)
+
+# --
+
+def night_capture (buf, lock) :
+
+    # a burst of raw frames merged into one JPEG in buf; returns the
+    # time spent on the camera, the merging is in night.took
+    took = 0.0
+    night.start()
+    for i in range (0, night.frames) :
+        capstart = hw.monotonic()
+        cam.raw(night.buffer())
+        took += hw.monotonic() - capstart
+        if i == 0 and lock :
+            # the rest of the burst is exposed like the first
+            cam.lock()
+        night.add()
+    night.finish(buf)
+    return took
+
+# --
+
+def engine_step () :
+
+    # whatever is due; returns when it next needs to run
+    global sperf, takepic, framecount, sbytes, dirnum, sessend
+    loopstart = hw.monotonic()
+
+    # Is it time to take a picture yet?
+    if (takepic) :
+        if sched.ready(loopstart) :
+            schas = hw.monotonic()
+            hw.probe ('capture', sched.due())
+            meters.observe ('slip_seconds', max(0.0, schas - sched.due()))
+            now = datetime.fromtimestamp(hw.time())
+            if sperf < 2 or overrun.value() == 'catchup' :
+                # two frames may fall in one second; jitter at under 2
+                # seconds, or overdue frames taken back to back
+                filename = now.strftime(FILEFMT_SUB)
+            else :
+                filename = now.strftime(FILEFMT)
+            imgname = PATHFMT % (dirnum, filename)
+            # sys.stderr.write(imgname+"\n")
+            if stills is not None and stills.same(cam.thumb(stills.THUMB)) :
+                # nothing has changed since the last frame kept
+                writer.line(events.encode('still', n=dirnum, t=hw.time(),
+                                          diff=round(stills.last, 2)))
+                sched.advance (hw.monotonic())
+                meters.inc ('still_total')
+            else :
+                buf = writer.get()
+                if buf is None :
+                    # every buffer is still waiting on the card; drop
+                    # this frame rather than stall the loop
+                    sys.stderr.write("dropped %s\n" % imgname)
+                    meters.inc ('dropped_total')
+                else :
+                    meta = {}
+                    if night is not None :
+                        took = night_capture (buf, framecount == 0 and ISO.value() != 0)
+                        meters.observe ('stack_seconds', night.took)
+                        meta = { 'stack' : night.frames,
+                                 'stack_ms' : int(night.took * 1000) }
+                    else :
+                        if framecount == 1 and ISO.value() != 0 :
+                            #- get awb from cam and make it stay that way
+                            cam.lock()
+                        capstart = hw.monotonic()
+                        cam.capture(buf)
+                        took = hw.monotonic() - capstart
+                    meters.observe ('capture_seconds', took)
+                    meters.inc ('frames_total')
+                    meters.inc ('bytes_total', buf.length)
+                    exposure, awb, iso = cam.exposure()
+                    sbytes += buf.length
+                    store.frame (resolutions.value(), buf.length)
+                    meta.update({ 'n' : dirnum, 'seq' : framecount,
+                                  't' : hw.time(), 'interval' : sperf,
+                                  'exposure' : exposure, 'awb' : awb, 'iso' : iso })
+                    writer.frame(buf, imgname, meta)
+                    framecount += 1
+                sched.taken (schas, hw.monotonic(), buf is not None)
+            if pace is not None :
+                pace.update (stills.last)
+
+            # In Repeat & evict old sessions go before the card fills
+            if cycle.value() == 2 and store.free() < KEEPFREE :
+                keeper.kick (dirnum)
+
+            # Stop cleanly while there is still room to finish the mp4
+            if store.full(resolutions.value()) :
+                stop_session ("Card full")
+
+        if (takepic) :
+            sperf = read_interval()
+            if pace is not None :
+                pace.bounds (sperf)
+                sperf = pace.interval
+            sched.retime (sperf)
+
+    # Is the recording as long as it was asked to be?  Not before the
+    # frame due right at the end has been taken
+    if takepic and loopstart >= sessend and sched.due() > sessend + 1e-6 :
+        stop_session ("Length")
+        if cycle.value() :
+            # Repeat; the next session's grid carries on the same beat
+            takepic = True
+            dirnum = start_session (cam, sessend)
+            sessend += reclen.value()
+
+    wake = [loopstart + IDLESEC]
+    if takepic :
+        wake.append(sched.due())
+        wake.append(sessend)
+
+    # Metrics are written out at the next wake after they fall due;
+    # the file is written on the writer thread
+    now = hw.monotonic()
+    meters.observe ('loop_seconds', now - loopstart)
+    if meters.due(now) :
+        meters.set ('free_bytes', store.free())
+        meters.set ('writer_depth', writer.depth())
+        meters.set ('recording', int(takepic))
+        writer.call (meters.write)
+    return min(wake)
+
+# --
+
+def engine_status () :
+
+    # the fields of engine.statusblock
+    st = { 'ready' : 1, 'recording' : int(takepic), 'why' : why, 'dirnum' : dirnum,
+           'frames' : framecount, 'shots' : meters.get('frames_total'),
+           'dropped' : meters.get('dropped_total'), 'stills' : meters.get('still_total'),
+           'free' : int(store.free()), 'interval' : sperf,
+           'left' : store.time_left(resolutions.value(), sperf),
+           'rate' : sched.rate() if takepic else 0.0,
+           'boot_seconds' : meters.get('boot_seconds') }
+    for name in ('loop_seconds', 'capture_seconds', 'write_seconds',
+                 'lcd_seconds', 'slip_seconds', 'stack_seconds') :
+        # the session being recorded, or the last one
+        st[name] = meters.quantile(name, 0.99, True)
+    return st
+
+# --
+
+def engine_stop () :
+
+    # end any recording and let the mp4s finish
+    if takepic :
+        stop_session ("Off")
+    keeper.stop()
+    store.stop()
+    writer.stop()
+    for e in encoders :
+        e.wait()
+    cam.stop()
+
+#-------------------------------------------------------------------------------
 
 # -- Init menu system
 
@@ -292,12 +794,52 @@ resolutions.additem ('1296x972 4:3', '1296x972', 0)
 resolutions.additem ('800x600 4:3', '800x600', 0)
 resolutions.additem ('640x480 4:3', '640x480', 0)
 
+# ---------------------------------
+# -- Interval multiplier for the wheel
+
+stepx = submenu ("Interval")
+stepx.additem ('Wheel x 0.1 sec', 0.1, 0)
+stepx.additem ('Wheel x 0.5 sec', 0.5, 0)
+stepx.additem ('Wheel x 1 sec', 1, 1)
+stepx.additem ('Wheel x 10 sec', 10, 0)
+stepx.additem ('Wheel x 1 min', 60, 0)
+stepx.additem ('Wheel x 10 min', 600, 0)
+stepx.additem ('Wheel x 1 hour', 3600, 0)
+
+# ---------------------------------
+# -- What to do when a capture overruns the next frame's deadline
+
+overrun = submenu ("Overrun")
+overrun.additem ('Skip frames', 'skip', 1)
+overrun.additem ('Catch up', 'catchup', 0)
+overrun.additem ('Stretch', 'stretch', 0)
+
 # ---------------------------------
 # -- Capture Mode
 
 modes = submenu ("Mode")
 modes.additem ('Frames only', 'F', 0)
 modes.additem ('Video & frames', 'V', 1)
+modes.additem ('Burst & video', 'B', 0)
+modes.additem ('Night & video', 'N', 0)
+
+# ---------------------------------
+# -- Burst rate; frames per second off the video port in B mode
+
+burst = submenu ("Burst rate")
+burst.additem ('2 fps', 2, 0)
+burst.additem ('5 fps', 5, 1)
+burst.additem ('10 fps', 10, 0)
+
+# ---------------------------------
+# -- Night stack; frames merged into each one taken in N mode.  Clip
+# -- leaves out what moved through a few of them, at more cost.
+
+stack = submenu ("Night stack")
+stack.additem ('Mean of 4', (4, 'mean'), 1)
+stack.additem ('Mean of 8', (8, 'mean'), 0)
+stack.additem ('Clip of 8', (8, 'clip'), 0)
+stack.additem ('Clip of 16', (16, 'clip'), 0)
 
 # ---------------------------------
 # -- Frames per Second
@@ -336,6 +878,7 @@ reclen.additem ('forever', 12*yr, 1)    # 12 years feels like forever
 cycle = submenu ("Cycles")
 cycle.additem ('Once', 0, 1)
 cycle.additem ('Repeat', 1, 0)
+cycle.additem ('Repeat & evict', 2, 0)  # oldest sessions go to keep KEEPFREE
 
 # ---------------------------------
 # -- ISO setting / auto every image
@@ -347,9 +890,62 @@ ISO.additem ('400', 400, 0)
 ISO.additem ('800', 800, 0)
 ISO.additem ('Auto', 0, 1)
 
+# ---------------------------------
+# -- Leave out frames that differ from the last one kept by less than this
+
+still = submenu ("Still frames")
+still.additem ('Keep all', 0, 1)
+still.additem ('Thin <1%', 1, 0)
+still.additem ('Thin <2%', 2, 0)
+still.additem ('Thin <5%', 5, 0)
+
+# ---------------------------------
+# -- Pace; Adaptive backs off from the wheel interval when nothing moves
+
+pacing = submenu ("Pace")
+pacing.additem ('Fixed', 'fixed', 1)
+pacing.additem ('Adaptive', 'adapt', 0)
+
+# ---------------------------------
+# -- Deflicker the video over a window of this many frames; for Auto ISO
+
+flicker = submenu ("Deflicker")
+flicker.additem ('Off', 0, 1)
+flicker.additem ('9 frames', 9, 0)
+flicker.additem ('25 frames', 25, 0)
+
+# ---------------------------------
+# -- Clock overlay on the video, in one of the corners
+
+clockpos = submenu ("Clock")
+clockpos.additem ('Off', None, 1)
+clockpos.additem ('Top left', 'nw', 0)
+clockpos.additem ('Top right', 'ne', 0)
+clockpos.additem ('Bottom left', 'sw', 0)
+clockpos.additem ('Bottom right', 'se', 0)
+
+# ---------------------------------
+# -- Diagnostics; a page of live figures rather than a setting
+
+diag = submenu ("Diagnostics")
+diag.additem ('Loop', 'loop_seconds', 1)
+diag.additem ('Camera', 'capture_seconds', 0)
+diag.additem ('Write', 'write_seconds', 0)
+diag.additem ('LCD', 'lcd_seconds', 0)
+diag.additem ('Slip', 'slip_seconds', 0)
+diag.additem ('Stack', 'stack_seconds', 0)
+diag.additem ('Counts', 'counts', 0)
+
+# ---------------------------------
+# -- Storage; Packed appends frames to big segment files, for long runs
+
+storage = submenu ("Storage")
+storage.additem ('Files', 'loose', 1)
+storage.additem ('Packed', 'packed', 0)
+
 #-- The set that comprises the whole menu system
 
-menus = [resolutions, ISO, modes, fps, reclen, cycle]
+menus = [resolutions, ISO, stepx, pacing, overrun, still, modes, burst, stack, fps, flicker, clockpos, storage, reclen, cycle, diag]
 menuix = 0
 in_menu = False
 
@@ -358,159 +954,245 @@ in_menu = False
 # -- MAIN ---------------------------------------------------------------------#
 # -----------------------------------------------------------------------------#
 
-sperf = read_sec()
-sleepval = SLEEPSEC
-picat = 0.0
-dirnum = 0
-framecount = 0
+def main (backend) :
+    global hw, lcd, lcdb, snap, engine, wheelsec, menuix, in_menu
+
+    hw = backend
+    bootstart = hw.monotonic()
+
+    # -- initialize GPIO
+
+    button_init() 
+    led_init()
+    wheelsec = inputs.sec
 
-flashat = 0
-
-b1start = 0
-b2start = 0
-
-camera = PiCamera()
-lcd_2lines (VERSION, VERDATE)
-time.sleep (1.5)
-lcd_space(lcd, False, dirnum, 0)
-shutter = camera.exposure_speed
-gain = camera.awb_gains
-camera.close()
-
-
-try:
-
-    while True :
-
-        time.sleep (sleepval)
-        loopstart = time.time() # for timing how long all this takes
-        button_scan()
-
-        # button 0
-        if button_press(0) :
-            if in_menu == False :
-                # toggle picture taking
-                sys.stderr.write("0 pressed\n")
-                takepic = not takepic
-                if (takepic) :
-                    sys.stderr.write("On\n")
-                    dirnum = next_directory(dirnum)
-                    sperf = read_sec()
-                    framecount = 0
-                    lcd_space(lcd, takepic, dirnum, framecount)
-                    picat = loopstart + sperf
-                    camera = PiCamera()
-                    if ISO.value() != 0 :
-                        camera.iso = ISO.value()
-                    #camera.resolution = "720p"
-                    camera.resolution = resolutions.value()
-                    camera.rotation = 270
-                    if modes.value() == 'V' :
-                        flag = "#VIDEO vidpath=%s/VIDEO/lapse-%0.4d.mp4 fps=%d\n" % (LAPSDIR, dirnum, fps.value())
+    # -- initialize LCD
+
+    lcd = hw.lcd(lcd_rs, lcd_en, lcd_d4, lcd_d5, lcd_d6, lcd_d7, 
+                 lcd_columns, lcd_rows, lcd_backlight)
+    lcd.enable_display(True)
+    lcdb = lcdbuf (lcd, lcd_columns, lcd_rows, LCDSEC)
+    lcdb.clear()
+
+    # -- the version shows while the rest starts up, rather than for a
+    # -- fixed time after
+    lcd_2lines (VERSION, VERDATE)
+    lcd_flush (True)
+
+    # -- the menus come back as they were left
+    snap = snapshot (LAPSDIR)
+    snap.load()
+    snap.restore (menus)
+
+    # -- the capture engine gets a process of its own on the Pi; the
+    # -- simulator's virtual clock needs it run from this loop
+    if hw.threads :
+        engine = engineproc (engine_init, engine_command, engine_step, engine_status,
+                             engine_stop, hw.monotonic, hw.poke)
+    else :
+        engine = localengine (engine_init, engine_command, engine_step, engine_status,
+                              engine_stop)
+    engine.start()
+
+    # -- a recording a power cut stopped carries on in a new session
+    recording = bool(snap.get('recording'))
+    if recording :
+        sys.stderr.write("Resume\n")
+        engine.send ('start', settings())
+
+    sleepval = 0
+    ready = False
+    shots = 0
+    lcdtimes = []   # LCD flush times not yet sent to the engine's metrics
+    lcdsent = 0
+
+    flashat = 0
+
+    b1start = 0
+    b2start = 0
+
+
+    try:
+
+        while hw.alive() :
+
+            inputs.wait (sleepval)
+            loopstart = hw.monotonic() # for timing how long all this takes
+            hw.probe ('loop')
+            button_scan()
+            if inputs.sec != wheelsec :
+                wheelsec = inputs.sec
+                engine.send ('wheel', wheelsec)
+            st = engine.status()
+
+            # button 0
+            if button_press(0) :
+                if in_menu == False :
+                    # toggle picture taking
+                    sys.stderr.write("0 pressed\n")
+                    if st['recording'] :
+                        engine.send ('stop')
                     else :
-                        flag = "#IMAGES\n"
-                    sys.stdout.write(flag)
+                        engine.send ('start', settings())
                 else :
-                    sys.stderr.write("Off\n")
-                    sys.stdout.write("#END\n")
-                    sys.stdout.flush()
-                    camera.close()
-                    takepic = False
-                    framecount = 0
-                    lcd_space(lcd, takepic, dirnum, framecount)
-            else :
-                in_menu = False
-                lcd_space(lcd, takepic, dirnum, framecount)
-
-        schas = time.time()
-        if button_press(1) :
-            b1start = schas
-            if not takepic :
-                if not in_menu :
-                    in_menu = True
-                    menuix = 0
-                    lcd_2lines (" ", " ")
+                    in_menu = False
+
+            schas = hw.monotonic()
+            if button_press(1) :
+                b1start = schas
+                if st['recording'] :
+                    # only the Diagnostics page while recording; the
+                    # settings stay as the session started
+                    in_menu = not in_menu
+                    if in_menu :
+                        menuix = menus.index (diag)
+                        lcd_line (1, diag.name)
+                        lcd_line (2, diag.current()[0])
                 else :
-                    menuix = (menuix + 1) % len (menus)
-                prompt, val = menus[menuix].current()
-                lcd_line (1, menus[menuix].name)
-                lcd_line (2, prompt)
-
-        if button_press(2) :
-            b2start = schas
-            if in_menu :
-                prompt, val = menus[menuix].selnext()
-                lcd_line (2, prompt)
-
-        # Buttons 1 & 2 extended hold to shut down gracefully
-        if button_down(1) and button_down(2) :
-            if ( (schas - b1start) >= HALTSPAN) and ( (schas - b2start) >= HALTSPAN) :
-                # shutdown; may require running as root
-                lcd.clear()
-                lcd_line(1, "Shutting down")
-                os.system("shutdown -h now")
-
-                exit (0)
-
-        # Is it time to turn off the led flash?
-        if flashat > 0 :
-            if loopstart >= flashat :
-                led_off()
-                flashat = 0
-
-
-        # Is it time to take a picture yet?
-        if (takepic) :
-            if loopstart >= picat :
-                schas = time.time()
-                now = datetime.now()
-                filename = now.strftime(FILEFMT)
-                imgname = PATHFMT % (dirnum, filename)
-                # sys.stderr.write(imgname+"\n")
-                if framecount == 1 and ISO.value() != 0 :
-                    #- get awb from cam and make it stay that way
-                    shutter = camera.exposure_speed
-                    camera.exposure_mode = 'off'
-                    camera.shutter_speed = shutter
-                    gain = camera.awb_gains
-                    camera.awb_mode = 'off'
-                    camera.awb_gains = gain
-                camera.capture(imgname)
-
-                sys.stdout.write(imgname+"\n")
-                sys.stdout.flush()
-                flashat = schas + FLASHSEC
+                    if not in_menu :
+                        in_menu = True
+                        menuix = 0
+                        lcd_2lines (" ", " ")
+                    else :
+                        menuix = (menuix + 1) % len (menus)
+                    prompt, val = menus[menuix].current()
+                    lcd_line (1, menus[menuix].name)
+                    lcd_line (2, prompt)
+
+            if button_press(2) :
+                b2start = schas
+                if in_menu and (menus[menuix] is diag or not st['recording']) :
+                    prompt, val = menus[menuix].selnext()
+                    lcd_line (2, prompt)
+
+            # Buttons 1 & 2 extended hold to shut down gracefully
+            if button_down(1) and button_down(2) :
+                if ( (schas - b1start) >= HALTSPAN) and ( (schas - b2start) >= HALTSPAN) :
+                    # shutdown; may require running as root
+                    lcdb.clear()
+                    lcd_line(1, "Shutting down")
+                    lcd_flush (True)
+                    engine.stop()
+                    hw.shutdown()
+
+                    return 0
+
+            # Is it time to turn off the led flash?
+            if flashat > 0 :
+                if loopstart >= flashat :
+                    led_off()
+                    flashat = 0
+
+            # The engine's turn, when it runs in this loop
+            engine.run()
+            st = engine.status()
+            if not engine.alive() :
+                lcd_2lines ("Engine stopped", " ")
+                lcd_flush (True)
+                return 1
+
+            if st['ready'] and not ready :
+                ready = True
+                boot = hw.monotonic() - bootstart
+                engine.send ('meter', ('set', 'boot_seconds', [boot]))
+                sys.stderr.write("ready in %0.3fs\n" % boot)
+
+            # Every frame taken flashes the led
+            if st['shots'] != shots :
+                shots = st['shots']
+                flashat = loopstart + FLASHSEC
                 led_on()
-                picat = loopstart + sperf
-                framecount += 1
-
-                camera.close()
-                camera = PiCamera()
-                camera.resolution = resolutions.value()
-                camera.rotation = 270
-                if ISO.value() != 0 :
-                    #- restore initial values
-                    camera.exposure_mode = 'off'
-                    camera.awb_mode = 'off'
-                    camera.iso = ISO.value()
-                    camera.shutter_speed = shutter
-                    camera.awb_gains = gain
-
-            sperf = read_sec()
-            lcd_space(lcd, takepic, dirnum, framecount)
-
-
-        delta_t = (time.time() - loopstart)
-        sleepval = SLEEPSEC - delta_t
-        if (sleepval < 0) :
-            sleepval = 0
-
-
-# ------------------------------------------------------------------------------ 
-
-except KeyboardInterrupt:
-    lcd.clear()
-    lcd.enable_display(False)
-    GPIO.cleanup ()
-    sys.stderr.write("\nexit\n")
-    exit(1)
+
+            if ready and not in_menu :
+                lcd_space (lcd, st)
+
+            # The Diagnostics page follows the figures while it is up
+            if in_menu and menus[menuix] is diag :
+                lcd_line (2, diag_line(st))
+
+            # Button presses show at once; status refreshes are rate limited
+            lcdstart = hw.monotonic()
+            lcd_flush (button_press(0) or button_press(1) or button_press(2))
+            lcdtimes.append (hw.monotonic() - lcdstart)
+            if loopstart >= lcdsent + DIAGSEC :
+                engine.send ('meter', ('observe', 'lcd_seconds', lcdtimes))
+                lcdtimes = []
+                lcdsent = loopstart
+
+            # The menus and recording state outlive a reboot
+            if (button_press(0) or bool(st['recording']) != recording) and not in_menu :
+                recording = bool(st['recording'])
+                if snap.update (menus, recording=recording) :
+                    engine.send ('save', snap.state)
+
+            # Sleep until the next thing that is due, an input edge, or the
+            # engine saying something has changed
+            wake = [loopstart + IDLESEC]
+            if lcdb.deadline() is not None :
+                wake.append(lcdb.deadline())
+            if engine.deadline() is not None :
+                wake.append(engine.deadline())
+            if flashat > 0 :
+                wake.append(flashat)
+            if button_down(1) and button_down(2) :
+                wake.append(max(b1start, b2start) + HALTSPAN)
+            if inputs.deadline() is not None :
+                wake.append(inputs.deadline())
+            if in_menu and menus[menuix] is diag :
+                wake.append(loopstart + DIAGSEC)
+
+            sleepval = min(wake) - hw.monotonic()
+            if (sleepval < 0) :
+                sleepval = 0
+
+        # -- only a simulated run gets here
+        engine.stop()
+        return 0
+
+    # ------------------------------------------------------------------------------ 
+
+    except KeyboardInterrupt:
+        engine.stop()
+        lcd.clear()
+        lcd.enable_display(False)
+        hw.cleanup ()
+        sys.stderr.write("\nexit\n")
+        return 1
+
+# --
+
+def usage () :
+    sys.stderr.write("Usage: %s [-d lapsdir] [-M metricsfile] [-S script [-H hours]]\n" % sys.argv[0])
+    sys.stderr.write("    -S replays a pin script on simulated hardware\n")
+    sys.stderr.write("    -M is where the Prometheus metrics go; lapsdir/metrics.prom by default\n")
+    sys.exit(1)
+
+# --
+
+if __name__ == "__main__" :
+
+    script = None
+    hours = 1.0
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "d:S:H:M:")
+    except getopt.GetoptError :
+        usage()
+    for o, a in opts :
+        if o == '-d' :
+            set_lapsdir (a)
+        elif o == '-S' :
+            script = a
+        elif o == '-H' :
+            hours = float (a)
+        elif o == '-M' :
+            metricsfile = a
+
+    if script :
+        from hwsim import simhw
+        backend = simhw (hours)
+        backend.load (script)
+    else :
+        from hwpi import pihw
+        backend = pihw ()
+
+    sys.exit (main (backend))
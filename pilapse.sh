@@ -1,6 +1,7 @@
 #!/bin/bash
 #
-# -- Run pilapse.py and link latest image to www directory
+# -- Run pilapse.py and have publisher.py link the latest image into the
+# -- www directory
 #
 #------------------------------------------------------------------------
 # Copyright (c) 2019, EGB13.net
@@ -35,25 +36,4 @@ WWW=/var/lapse
 
 [ -d "${WWW}" ] || { echo "$WWW: No such directory" >&2 ; exit 1 ; }
 
-/usr/local/sbin/pilapse.py | while read f ; do
-
-    vidset=`expr "$f" : '#VIDEO \(.*\)'`
-    if [ "$vidset" != "" ] ; then
-        eval $vidset
-        while read img ; do
-            /bin/fgrep -q "#" <<< "$img" && break
-            [ -f "${img}" ] && {
-                /bin/rm -f "${WWW}/latest.jpg"
-                /bin/ln "${img}" "${WWW}/latest.jpg"
-                ## /bin/rm -f "$img"
-                /bin/cat "${WWW}/latest.jpg"
-            }
-        done | /usr/bin/nice /usr/local/bin/ffmpeg -loglevel 0 -y -f image2pipe -vcodec mjpeg -r ${fps:-24} -i - -vcodec mpeg4 -qscale 5 -r ${fps:-24} -f mp4 "${vidpath:?}"
-    else
-        [ -f "${f}" ] && {
-            /bin/rm -f "${WWW}/latest.jpg"
-            /bin/ln "${f}" "${WWW}/latest.jpg"
-        }
-    fi
-
-done
+/usr/local/sbin/pilapse.py | /usr/local/sbin/publisher.py -w "${WWW}"
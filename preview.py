@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import io
+import os
+
+try :
+    from PIL import Image
+except ImportError :
+    Image = None        # no previews without PIL
+
+################################################################################
+# -- previewer class; preview, thumbnail and contact sheets of each frame
+################################################################################
+
+class previewer :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 19:20:44 $"
+
+    COLS = 10           # contact sheet grid
+    ROWS = 10
+    SAVEEVERY = 10      # frames between rewrites of the sheet being filled
+
+    def __init__ (self, preview=640, thumb=160, quality=80) :
+
+        # -- preview and thumb are the longest side in pixels.  The JPEG
+        # -- is decoded once, at the smallest 1/2^n scale still bigger
+        # -- than the preview, and both are cut from that.
+
+        if Image is None :
+            raise ImportError ("previewer needs PIL")
+        self.preview = preview
+        self.thumb = thumb
+        self.quality = quality
+        self.cell = (thumb, thumb * 3 // 4)
+        self.sheet = None       # contact sheet being filled
+        self.sheetdir = None
+        self.sheetnum = 0
+        self.placed = 0         # thumbs on the current sheet
+        self.made = 0
+        self.failed = 0
+
+    def make (self, data, path, loose=True) :
+
+        # -- write the preview and thumbnail of the JPEG data that went to
+        # -- path, and add the thumbnail to the session's contact sheet.
+        # -- Returns the new files as frame event fields.  Packed sessions
+        # -- (loose False) get no file per frame: only the newest preview,
+        # -- as D####/preview.jpg, and the sheets.
+
+        try :
+            im = Image.open (io.BytesIO (data))
+            im.draft ('RGB', (self.preview, self.preview))
+            im = im.convert ('RGB')
+        except (IOError, ValueError) :
+            self.failed += 1
+            return {}
+        im.thumbnail ((self.preview, self.preview), Image.BILINEAR)
+        dirname, name = os.path.split (path)
+        fields = {}
+        if loose :
+            fields['preview'] = self._save (im, dirname, 'preview', name)
+        else :
+            fields['preview'] = self._latest (im, dirname)
+        im.thumbnail ((self.thumb, self.thumb), Image.BILINEAR)
+        if loose :
+            fields['thumb'] = self._save (im, dirname, 'thumb', name)
+        self._place (im, dirname)
+        self.made += 1
+        return fields
+
+    def _save (self, im, dirname, sub, name) :
+
+        subdir = os.path.join (dirname, sub)
+        if not os.path.isdir (subdir) :
+            os.makedirs (subdir)
+        path = os.path.join (subdir, name)
+        im.save (path, 'JPEG', quality=self.quality)
+        return path
+
+    def _latest (self, im, dirname) :
+
+        # -- replace the one preview of a packed session in one rename
+
+        path = os.path.join (dirname, 'preview.jpg')
+        im.save (path + ".tmp", 'JPEG', quality=self.quality)
+        os.rename (path + ".tmp", path)
+        return path
+
+    def _place (self, im, dirname) :
+
+        # -- paste into the next cell; a full sheet, or a new session,
+        # -- starts another
+
+        if dirname != self.sheetdir :
+            self.close ()
+            self.sheetdir = dirname
+            self.sheetnum = 0
+        if self.sheet is None :
+            self.sheetnum += 1
+            self.sheet = Image.new ('RGB', (self.cell[0] * self.COLS, self.cell[1] * self.ROWS))
+            self.placed = 0
+        col = self.placed % self.COLS
+        row = self.placed // self.COLS
+        x = col * self.cell[0] + (self.cell[0] - im.size[0]) // 2
+        y = row * self.cell[1] + (self.cell[1] - im.size[1]) // 2
+        self.sheet.paste (im, (x, y))
+        self.placed += 1
+        if self.placed == self.COLS * self.ROWS :
+            self.close ()
+        elif self.placed % self.SAVEEVERY == 0 :
+            self._write_sheet ()
+
+    def _write_sheet (self) :
+
+        path = os.path.join (self.sheetdir, 'sheets', "sheet-%0.4d.jpg" % self.sheetnum)
+        if not os.path.isdir (os.path.dirname (path)) :
+            os.makedirs (os.path.dirname (path))
+        self.sheet.save (path + ".tmp", 'JPEG', quality=self.quality)
+        os.rename (path + ".tmp", path)
+
+    def close (self) :
+
+        # -- write out the sheet being filled; the session is over
+
+        if self.sheet is not None :
+            self._write_sheet ()
+        self.sheet = None
+
+    def stats (self) :
+        return "made=%d failed=%d sheets=%d" % (self.made, self.failed, self.sheetnum)
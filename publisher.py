@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Reads the event stream from pilapse.py on stdin and publishes the newest
+#-- frame as latest.jpg in the web directory.  The link is replaced with a
+#-- rename, so latest.jpg is never missing.  When frames arrive faster than
+#-- they can be published, everything waiting in the pipe is read at once
+#-- and only the newest frame of the batch is linked.  Its preview, when
+#-- pilapse.py made one, goes up as latest-preview.jpg the same way.
+
+import sys, os, errno, select, shutil, getopt
+
+import events
+import segstore
+
+################################################################################
+# -- publisher class; keeps latest.jpg pointing at the newest frame
+################################################################################
+
+class publisher :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 16:10:44 $"
+
+    def __init__ (self, www) :
+
+        self.www = www
+        self.session = None     # the start event of the current session
+        self.events = 0
+        self.batches = 0
+        self.published = 0
+        self.skipped = 0        # frames overtaken by newer ones in a batch
+
+    def publish (self, path, name="latest.jpg") :
+
+        # -- link path in as name, replacing the old one in one rename
+
+        dest = os.path.join(self.www, name)
+        tmp = os.path.join(self.www, "." + name + ".tmp")
+        try :
+            os.unlink(tmp)
+        except OSError :
+            pass
+        try :
+            os.link(path, tmp)
+        except OSError as e :
+            if e.errno == errno.ENOENT :
+                return False
+            shutil.copyfile(path, tmp)      # no hard links here; copy
+        os.rename(tmp, dest)
+        self.published += 1
+        return True
+
+    def extract (self, seg, offset, name="latest.jpg") :
+
+        # -- a packed frame has no file to link; write it out instead
+
+        dest = os.path.join(self.www, name)
+        tmp = os.path.join(self.www, "." + name + ".tmp")
+        try :
+            data = segstore.readat(seg, offset)[1]
+        except (IOError, OSError, ValueError) :
+            return False
+        fh = open(tmp, 'wb')
+        fh.write(data)
+        fh.close()
+        os.rename(tmp, dest)
+        self.published += 1
+        return True
+
+    def handle (self, batch) :
+
+        # -- act on a batch of events; only the newest frame is published
+
+        self.batches += 1
+        newest = None
+        for ev in batch :
+            self.events += 1
+            kind = ev['ev']
+            if kind == 'frame' :
+                if newest is not None :
+                    self.skipped += 1
+                newest = ev
+            elif kind == 'start' :
+                self.session = ev
+            elif kind == 'end' :
+                self.session = None
+        if newest is not None :
+            if 'seg' in newest :
+                self.extract(newest['seg'], newest['offset'])
+            else :
+                self.publish(newest['path'])
+            if 'preview' in newest :
+                self.publish(newest['preview'], "latest-preview.jpg")
+
+    def parse (self, line) :
+
+        ev = events.decode(line)
+        if ev is None and line and line[0] == '/' and os.path.isfile(line) :
+            # -- a bare file name, as older pilapse.py printed
+            ev = { 'v' : events.PROTOCOL, 'ev' : 'frame', 'path' : line }
+        return ev
+
+    def run (self, fd) :
+
+        # -- until end of file on fd
+
+        pending = b''
+        while True :
+            select.select([fd], [], [])
+            chunk = os.read(fd, 65536)
+            if not chunk :
+                break
+            pending += chunk
+            lines = pending.split(b'\n')
+            pending = lines.pop()
+            batch = []
+            for line in lines :
+                ev = self.parse(line.decode('utf-8', 'replace').strip())
+                if ev is not None :
+                    batch.append(ev)
+            if batch :
+                self.handle(batch)
+
+    def stats (self) :
+        return "events=%d batches=%d published=%d skipped=%d" % (
+            self.events, self.batches, self.published, self.skipped)
+
+# --
+
+def usage () :
+    sys.stderr.write ("Usage: %s [-w www-directory]\n" % sys.argv[0])
+    sys.exit (1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    www = "/var/lapse"
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "w:")
+    except getopt.GetoptError :
+        usage ()
+    for o, a in opts :
+        if o == '-w' :
+            www = a
+
+    if not os.path.isdir (www) :
+        sys.stderr.write ("%s: No such directory\n" % www)
+        sys.exit (1)
+
+    pub = publisher (www)
+    try :
+        pub.run (sys.stdin.fileno ())
+    except KeyboardInterrupt :
+        pass
+    sys.stderr.write ("publisher %s\n" % pub.stats ())
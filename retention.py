@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import sys
+import threading
+
+################################################################################
+# -- retention class; evicts the oldest sessions to keep space free
+################################################################################
+
+class retention :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 20:58:40 $"
+
+    def __init__ (self, sessions, store, floor, vidfmt=None, threaded=True) :
+
+        # -- sessions is the sesscat and store the storemon of LAPSDIR.
+        # -- Whenever kicked, sessions are removed oldest first, with the
+        # -- video vidfmt % num if there is one, until store has floor
+        # -- bytes free.  The session being recorded is never touched;
+        # -- any other is finished, even one a power cut ended.
+
+        self.sessions = sessions
+        self.store = store
+        self.floor = floor
+        self.vidfmt = vidfmt
+        self.threaded = threaded
+        self.current = None
+        self.evicted = 0
+        self.freed = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def short (self) :
+        return self.store.free() < self.floor
+
+    def evict (self) :
+
+        # -- remove sessions until there is room; returns how many went
+
+        gone = 0
+        with self.lock :
+            while self.short() :
+                nums = sorted([n for n in self.sessions.sessions() if n != self.current])
+                if not nums :
+                    break       # the card fills and Card full ends it
+                num = nums[0]
+                before = self.store.free()
+                try :
+                    self.sessions.remove(num)
+                    if self.vidfmt and os.path.exists(self.vidfmt % num) :
+                        os.unlink(self.vidfmt % num)
+                except OSError as e :
+                    sys.stderr.write("retention: D%0.4d: %s\n" % (num, e))
+                    break
+                self.store.sample()
+                self.freed += max(0, self.store.free() - before)
+                self.evicted += 1
+                gone += 1
+                sys.stderr.write("retention: evicted D%0.4d\n" % num)
+        return gone
+
+    def kick (self, current=None) :
+
+        # -- check now; current is the session being recorded, if any
+
+        self.current = current
+        if self.threaded and self.running :
+            self.wake.set()
+        else :
+            self.evict()
+
+    def _run (self) :
+
+        while self.running :
+            self.wake.wait()
+            self.wake.clear()
+            if self.running :
+                self.evict()
+
+    def start (self) :
+
+        if self.thread is not None or not self.threaded :
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="retention")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop (self) :
+
+        self.running = False
+        self.wake.set()
+        if self.thread is not None :
+            self.thread.join()
+        self.thread = None
+
+    def stats (self) :
+        return "evicted=%d freed=%d" % (self.evicted, self.freed)
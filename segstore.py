@@ -0,0 +1,447 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Packed storage of a session: frames appended to rolling segment files
+#-- D####/seg-NNNNN.pls instead of one file each.  Every record carries
+#-- its own CRC32, a sealed segment ends with a trailer holding the CRC32
+#-- of everything in it, and D####/segs.idx has the segment and offset
+#-- of every frame, 16 bytes each, in the order of frames.idx.  After a
+#-- crash the tail is recovered by walking the records past the last
+#-- one indexed and cutting the segment at the first that doesn't check.
+#--
+#-- Run as a command it converts between the packed and loose layouts,
+#-- checks a packed session, and exports frames.
+
+import os
+import re
+import sys
+import mmap
+import glob
+import zlib
+import struct
+import getopt
+
+SEGFMT = "seg-%0.5d.pls"
+SEGPAT = re.compile(r'^seg-(\d{5})\.pls$')
+SEGINDEX = "segs.idx"
+SEGBYTES = 256 * 1024 * 1024    # roll over to a new segment past this
+
+FRAME = struct.Struct('<4sIdIIH2x')     # magic, seq, t, size, crc, name length
+TRAILER = struct.Struct('<4sII4x')      # magic, frames, crc of the segment
+OFFSET = struct.Struct('<IQI')          # segment, offset of the record, size
+FRAMEMAGIC = b'PLFR'
+SEALMAGIC = b'PLSE'
+
+################################################################################
+# -- segwriter class; appends frames to the segments of one session
+################################################################################
+
+class segwriter :
+
+    def __init__ (self, dirname, segbytes=SEGBYTES) :
+
+        self.dirname = dirname
+        self.segbytes = segbytes
+        recover(dirname)
+        self.idx = open(os.path.join(dirname, SEGINDEX), 'ab')
+        segs = segments(dirname)
+        self.segnum = segs[-1] if segs else 0
+        self.seg = None
+        self.crc = 0
+        self.count = 0
+        if segs and not sealed(os.path.join(dirname, SEGFMT % self.segnum)) :
+            self._open()
+            self.count, self.crc = _tally(self.path)
+
+    def _open (self) :
+
+        self.path = os.path.join(self.dirname, SEGFMT % self.segnum)
+        self.seg = open(self.path, 'ab')
+
+    def _roll (self) :
+
+        if self.seg is not None :
+            self._seal()
+        self.segnum += 1
+        self.crc = 0
+        self.count = 0
+        self._open()
+
+    def _seal (self) :
+
+        self.seg.write(TRAILER.pack(SEALMAGIC, self.count, self.crc & 0xffffffff))
+        self.seg.close()
+        self.seg = None
+
+    def append (self, data, name, seq=0, t=0.0) :
+
+        # -- one frame; returns (segment file, offset) of its record
+
+        if self.seg is None or self.seg.tell() >= self.segbytes :
+            self._roll()
+        name = name.encode('utf-8')
+        try :
+            crc = zlib.crc32(data, zlib.crc32(name)) & 0xffffffff
+        except TypeError :
+            # -- python 2 zlib takes no memoryview
+            data = data.tobytes()
+            crc = zlib.crc32(data, zlib.crc32(name)) & 0xffffffff
+        offset = self.seg.tell()
+        self.seg.write(FRAME.pack(FRAMEMAGIC, seq, t, len(data), crc, len(name)))
+        self.seg.write(name)
+        self.seg.write(data)
+        self.seg.flush()
+        self.crc = zlib.crc32(struct.pack('<I', crc), self.crc)
+        self.count += 1
+        self.idx.write(OFFSET.pack(self.segnum, offset, len(data)))
+        self.idx.flush()
+        return self.path, offset
+
+    def close (self) :
+
+        if self.seg is not None :
+            self._seal()
+        self.idx.close()
+
+################################################################################
+# -- segreader class; memory-mapped frames of a packed session
+################################################################################
+
+class segreader :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 20:06:31 $"
+
+    def __init__ (self, dirname) :
+
+        self.dirname = dirname
+        self.maps = {}
+        fh = open(os.path.join(dirname, SEGINDEX), 'rb')
+        self.offsets = fh.read()
+        fh.close()
+        self.count = len(self.offsets) // OFFSET.size
+
+    def __len__ (self) :
+        return self.count
+
+    def _map (self, segnum) :
+
+        m = self.maps.get(segnum)
+        if m is None :
+            fh = open(os.path.join(self.dirname, SEGFMT % segnum), 'rb')
+            m = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            fh.close()
+            self.maps[segnum] = m
+        return m
+
+    def record (self, n) :
+
+        # -- (name, seq, t, memoryview of the JPEG) of frame n
+
+        if n < 0 :
+            n += self.count
+        if n < 0 or n >= self.count :
+            raise IndexError("frame %d of %d" % (n, self.count))
+        segnum, offset, size = OFFSET.unpack_from(self.offsets, n * OFFSET.size)
+        m = self._map(segnum)
+        magic, seq, t, size, crc, namelen = FRAME.unpack_from(m, offset)
+        start = offset + FRAME.size
+        name = m[start:start + namelen].decode('utf-8')
+        start += namelen
+        try :
+            data = memoryview(m)[start:start + size]
+        except TypeError :
+            # -- python 2 mmap has no buffer interface; copy the slice
+            data = memoryview(m[start:start + size])
+        return name, seq, t, data
+
+    def frame (self, n) :
+        return self.record(n)[3].tobytes()
+
+    def export (self, n, path) :
+
+        # -- frame n as a file of its own
+
+        name, seq, t, data = self.record(n)
+        if os.path.isdir(path) :
+            path = os.path.join(path, name)
+        fh = open(path, 'wb')
+        fh.write(data)
+        fh.close()
+        return path
+
+    def stream (self, feed, first=0, end=None) :
+
+        # -- frames first..end-1 to feed, which takes bytes (a videncoder's
+        # -- feed, or a file's write)
+
+        if end is None or end > self.count :
+            end = self.count
+        for n in range(first, end) :
+            feed(self.record(n)[3].tobytes())
+        return end - first
+
+    def close (self) :
+
+        for m in self.maps.values() :
+            m.close()
+        self.maps = {}
+
+# --
+
+def readat (path, offset) :
+
+    # -- (name, JPEG bytes) of the record at offset in segment path,
+    # -- for readers that want one frame without mapping the segment
+
+    fh = open(path, 'rb')
+    fh.seek(offset)
+    magic, seq, t, size, crc, namelen = FRAME.unpack(fh.read(FRAME.size))
+    if magic != FRAMEMAGIC :
+        fh.close()
+        raise ValueError("%s: no frame at %d" % (path, offset))
+    name = fh.read(namelen).decode('utf-8')
+    data = fh.read(size)
+    fh.close()
+    return name, data
+
+def segments (dirname) :
+
+    nums = []
+    for name in os.listdir(dirname) :
+        m = SEGPAT.match(name)
+        if m :
+            nums.append(int(m.group(1)))
+    return sorted(nums)
+
+def sealed (path) :
+
+    # -- does the segment end with a trailer that checks out
+
+    size = os.path.getsize(path)
+    if size < TRAILER.size :
+        return False
+    count, crc = _tally(path, size - TRAILER.size)
+    fh = open(path, 'rb')
+    fh.seek(size - TRAILER.size)
+    magic, tcount, tcrc = TRAILER.unpack(fh.read(TRAILER.size))
+    fh.close()
+    return magic == SEALMAGIC and tcount == count and tcrc == crc
+
+def _sealedat (path, end, count) :
+
+    # -- is there a trailer for count frames just past the record ending
+    # -- at end; reads only the trailer, where sealed() reads everything
+
+    if os.path.getsize(path) != end + TRAILER.size :
+        return False
+    fh = open(path, 'rb')
+    fh.seek(end)
+    magic, tcount, tcrc = TRAILER.unpack(fh.read(TRAILER.size))
+    fh.close()
+    return magic == SEALMAGIC and tcount == count
+
+def _walk (path, limit=None, offset=0) :
+
+    # -- (offset, next offset, size, crc) of every record that checks from
+    # -- offset on, in order, up to the first that doesn't or the trailer
+
+    fh = open(path, 'rb')
+    end = os.path.getsize(path) if limit is None else limit
+    while offset + FRAME.size <= end :
+        fh.seek(offset)
+        magic, seq, t, size, crc, namelen = FRAME.unpack(fh.read(FRAME.size))
+        after = offset + FRAME.size + namelen + size
+        if magic != FRAMEMAGIC or after > end :
+            break
+        if zlib.crc32(fh.read(namelen + size)) & 0xffffffff != crc :
+            break
+        yield offset, after, size, crc
+        offset = after
+    fh.close()
+
+def _tally (path, limit=None) :
+
+    count = 0
+    segcrc = 0
+    for offset, after, size, crc in _walk(path, limit) :
+        count += 1
+        segcrc = zlib.crc32(struct.pack('<I', crc), segcrc)
+    return count, segcrc & 0xffffffff
+
+def recover (dirname, full=False) :
+
+    # -- make segs.idx and the last segment agree after a crash.  Index
+    # -- entries for earlier segments stand; the last one is walked from
+    # -- its last indexed record, the good records past it indexed and a
+    # -- torn record cut off.  A segment sealed just past its last indexed
+    # -- record is left as it is.  full walks and checks the whole of the
+    # -- last segment instead.  Returns the number of frames indexed.
+
+    segs = segments(dirname)
+    if not segs :
+        return 0
+    last = segs[-1]
+    idxpath = os.path.join(dirname, SEGINDEX)
+    good = []
+    mine = []
+    try :
+        fh = open(idxpath, 'rb')
+        old = fh.read()
+        fh.close()
+    except IOError :
+        old = None
+    torn = old is None or len(old) % OFFSET.size != 0
+    old = (old or b'')[0:len(old or b'') // OFFSET.size * OFFSET.size]
+    for n in range(0, len(old) // OFFSET.size) :
+        rec = old[n * OFFSET.size:(n + 1) * OFFSET.size]
+        if OFFSET.unpack(rec)[0] < last :
+            good.append(rec)
+        else :
+            mine.append(rec)
+    path = os.path.join(dirname, SEGFMT % last)
+    start = 0
+    if mine and not full :
+        segnum, start, size = OFFSET.unpack(mine.pop())
+        fh = open(path, 'rb')
+        fh.seek(start)
+        head = fh.read(FRAME.size)
+        fh.close()
+        if len(head) == FRAME.size :
+            after = start + FRAME.size + FRAME.unpack(head)[5] + size
+            if _sealedat(path, after, len(mine) + 1) :
+                return len(old) // OFFSET.size
+    else :
+        mine = []
+    end = start
+    for offset, after, size, crc in _walk(path, None, start) :
+        mine.append(OFFSET.pack(last, offset, size))
+        end = after
+    if full :
+        done = sealed(path)
+    else :
+        done = _sealedat(path, end, len(mine))
+    if not done and os.path.getsize(path) != end :
+        fh = open(path, 'r+b')
+        fh.truncate(end)
+        fh.close()
+    good.extend(mine)
+    if torn or b''.join(good) != old :
+        fh = open(idxpath + ".tmp", 'wb')
+        fh.write(b''.join(good))
+        fh.close()
+        os.rename(idxpath + ".tmp", idxpath)
+    return len(good)
+
+# --
+
+def pack (dirname, remove=False) :
+
+    # -- loose JPEGs of a session into segments, in name order
+
+    names = sorted(glob.glob(os.path.join(dirname, "*.jpg")))
+    w = segwriter(dirname)
+    for seq, path in enumerate(names) :
+        fh = open(path, 'rb')
+        data = fh.read()
+        fh.close()
+        w.append(data, os.path.basename(path), seq, os.path.getmtime(path))
+    w.close()
+    if remove :
+        for path in names :
+            os.unlink(path)
+    return len(names)
+
+def unpack (dirname, remove=False) :
+
+    r = segreader(dirname)
+    for n in range(0, len(r)) :
+        r.export(n, dirname)
+    count = len(r)
+    r.close()
+    if remove :
+        for num in segments(dirname) :
+            os.unlink(os.path.join(dirname, SEGFMT % num))
+        os.unlink(os.path.join(dirname, SEGINDEX))
+    return count
+
+# --
+
+def usage () :
+    sys.stderr.write("Usage: %s -p|-u|-c [-r] D####\n" % sys.argv[0])
+    sys.stderr.write("       %s -x n [-o path] D####\n" % sys.argv[0])
+    sys.stderr.write("       %s -s first:end D#### | ffmpeg -f image2pipe ...\n" % sys.argv[0])
+    sys.stderr.write("    -p packs loose frames, -u unpacks, -c checks and recovers;\n")
+    sys.stderr.write("    -r removes what was converted from\n")
+    sys.exit(1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    action = None
+    remove = False
+    outpath = None
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "pucrx:o:s:")
+    except getopt.GetoptError :
+        usage()
+    for o, a in opts :
+        if o in ('-p', '-u', '-c') :
+            action = (o, None)
+        elif o in ('-x', '-s') :
+            action = (o, a)
+        elif o == '-r' :
+            remove = True
+        elif o == '-o' :
+            outpath = a
+    if action is None or len(args) != 1 or not os.path.isdir(args[0]) :
+        usage()
+    d = args[0]
+
+    op, arg = action
+    if op == '-p' :
+        sys.stderr.write("%d frames packed\n" % pack(d, remove))
+    elif op == '-u' :
+        sys.stderr.write("%d frames unpacked\n" % unpack(d, remove))
+    elif op == '-c' :
+        n = recover(d, True)
+        bad = [num for num in segments(d)[:-1] if not sealed(os.path.join(d, SEGFMT % num))]
+        sys.stderr.write("%d frames in %d segments, %d unsealed before the last\n"
+                         % (n, len(segments(d)), len(bad)))
+        sys.exit(1 if bad else 0)
+    elif op == '-x' :
+        r = segreader(d)
+        sys.stderr.write("%s\n" % r.export(int(arg), outpath or "."))
+    elif op == '-s' :
+        first, _, end = arg.partition(':')
+        r = segreader(d)
+        out = getattr(sys.stdout, 'buffer', sys.stdout)
+        n = r.stream(out.write, int(first or 0), int(end) if end else None)
+        sys.stderr.write("%d frames\n" % n)
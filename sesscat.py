@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import re
+import json
+import time
+import shutil
+
+from frameindex import frameindex
+
+################################################################################
+# -- sesscat class; catalog of D#### session directories under LAPSDIR
+################################################################################
+
+class sesscat :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 14:02:26 $"
+
+    LASTFILE = "sessions.last"  # number of the newest session
+    LOGFILE  = "sessions.log"   # one JSON record per line, append only
+    DIRFMT   = "D%0.4d"
+    DIRPAT   = re.compile(r'^D(\d{4,})$')
+
+    def __init__ (self, lapsdir) :
+
+        # -- one listdir at boot catches directories past a gap or made
+        # -- by hand, and sessions deleted by hand; alloc() stays O(1)
+
+        self.lapsdir = lapsdir
+        self.last = self._readlast()
+        self.repair()
+
+    def dirpath (self, num) :
+        return os.path.join(self.lapsdir, self.DIRFMT % num)
+
+    def _readlast (self) :
+
+        try :
+            fh = open(os.path.join(self.lapsdir, self.LASTFILE))
+            last = int(fh.read().strip())
+            fh.close()
+            return last
+        except (IOError, OSError, ValueError) :
+            return None
+
+    def _writelast (self) :
+
+        # -- write and rename so a power cut leaves the old or new number
+
+        path = os.path.join(self.lapsdir, self.LASTFILE)
+        fh = open(path + ".tmp", "w")
+        fh.write("%d\n" % self.last)
+        fh.flush()
+        os.fsync(fh.fileno())
+        fh.close()
+        os.rename(path + ".tmp", path)
+
+    def _log (self, rec) :
+
+        fh = open(os.path.join(self.lapsdir, self.LOGFILE), "a")
+        fh.write(json.dumps(rec, sort_keys=True) + "\n")
+        fh.close()
+
+    def alloc (self) :
+
+        # -- make the next session directory and return its number
+
+        while True :
+            num = self.last + 1
+            try :
+                os.mkdir(self.dirpath(num), 0o777)
+                break
+            except OSError :
+                if not os.path.isdir(self.dirpath(num)) :
+                    raise
+                self.repair()   # someone made it behind our back
+        self.last = num
+        self._writelast()
+        return num
+
+    def start (self, num, resolution, interval, at=None) :
+
+        self._log({ 'ev' : 'start', 'n' : num, 'start' : at or time.time(),
+                    'resolution' : resolution, 'interval' : interval })
+
+    def end (self, num, frames, nbytes, late=0, missed=0, at=None) :
+
+        self._log({ 'ev' : 'end', 'n' : num, 'end' : at or time.time(),
+                    'frames' : frames, 'bytes' : nbytes,
+                    'late' : late, 'missed' : missed })
+
+    def remove (self, num) :
+
+        # -- delete a session's directory and everything in it
+
+        if os.path.isdir(self.dirpath(num)) :
+            shutil.rmtree(self.dirpath(num))
+        self._log({ 'ev' : 'gone', 'n' : num })
+
+    def sessions (self) :
+
+        # -- number -> merged record of everything logged about it
+
+        found = {}
+        try :
+            fh = open(os.path.join(self.lapsdir, self.LOGFILE))
+        except (IOError, OSError) :
+            return found
+        for line in fh :
+            try :
+                rec = json.loads(line)
+            except ValueError :
+                continue        # torn last line after a power cut
+            if rec.get('ev') == 'gone' :
+                found.pop(rec['n'], None)
+                continue
+            found.setdefault(rec['n'], {}).update(rec)
+        fh.close()
+        for num in found :
+            found[num].pop('ev', None)
+        return found
+
+    def repair (self) :
+
+        # -- one listdir to bring the counter and the log back in line
+        # -- with the directories actually on the card
+
+        nums = set()
+        for name in os.listdir(self.lapsdir) :
+            m = self.DIRPAT.match(name)
+            if m and os.path.isdir(os.path.join(self.lapsdir, name)) :
+                nums.add(int(m.group(1)))
+        known = self.sessions()
+        for num in sorted(nums - set(known)) :
+            frames, nbytes = self._measure(num)
+            self._log({ 'ev' : 'found', 'n' : num, 'frames' : frames, 'bytes' : nbytes })
+        for num in sorted(set(known) - nums) :
+            self._log({ 'ev' : 'gone', 'n' : num })
+        last = max(nums | set([self.last or 0]))
+        if last != self.last :
+            self.last = last
+            self._writelast()
+        return self.last
+
+    def _measure (self, num) :
+
+        path = self.dirpath(num)
+        try :
+            idx = frameindex(path)
+            frames, nbytes = len(idx), idx.nbytes()
+            idx.close()
+            return frames, nbytes
+        except (IOError, OSError, ValueError) :
+            pass                # older session; count the files
+        frames = 0
+        nbytes = 0
+        for name in os.listdir(path) :
+            if name.endswith('.jpg') :
+                frames += 1
+                nbytes += os.path.getsize(os.path.join(path, name))
+        return frames, nbytes
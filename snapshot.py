@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import sys
+import json
+
+STATEFILE = "pilapse.state"
+
+################################################################################
+# -- snapshot class; the menu choices and recording state across reboots
+################################################################################
+
+class snapshot :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 21:40:12 $"
+
+    def __init__ (self, path) :
+
+        # -- path is a directory, for STATEFILE in it, or the file itself.
+        # -- Menu choices are kept by prompt rather than position, so a
+        # -- menu that gains an item still comes back right.
+
+        if os.path.isdir(path) :
+            path = os.path.join(path, STATEFILE)
+        self.path = path
+        self.state = {}
+        self.saves = 0
+
+    def load (self) :
+
+        # -- the last state saved; a missing or torn file is a fresh start
+
+        try :
+            fh = open(self.path)
+            try :
+                state = json.load(fh)
+            finally :
+                fh.close()
+        except (IOError, OSError, ValueError) :
+            state = {}
+        self.state = state if isinstance(state, dict) else {}
+        return self.state
+
+    def restore (self, menus) :
+
+        # -- put each menu back on its saved choice; returns how many were
+
+        saved = self.state.get('menus', {})
+        done = 0
+        for menu in menus :
+            prompt = saved.get(menu.name)
+            if prompt in menu.prompts :
+                menu.setval(menu.prompts.index(prompt))
+                done += 1
+        return done
+
+    def get (self, key, default=None) :
+        return self.state.get(key, default)
+
+    def update (self, menus, **extra) :
+
+        # -- take the menus and extra as the state; True if it changed
+        # -- and wants saving
+
+        state = { 'menus' : dict([(m.name, m.current()[0]) for m in menus]) }
+        state.update(extra)
+        if state == self.state :
+            return False
+        self.state = state
+        return True
+
+    def save (self) :
+
+        # -- write the state out, replacing the old file in one rename;
+        # -- False if the card would not take it
+
+        state = self.state
+        tmp = self.path + ".tmp"
+        try :
+            fh = open(tmp, 'w')
+            try :
+                json.dump(state, fh, sort_keys=True)
+                fh.flush()
+                os.fsync(fh.fileno())
+            finally :
+                fh.close()
+            os.rename(tmp, self.path)
+        except (IOError, OSError) as e :
+            sys.stderr.write("snapshot: %s: %s\n" % (self.path, e))
+            return False
+        self.saves += 1
+        return True
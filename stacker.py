@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import time
+
+try :
+    import numpy
+except ImportError :
+    numpy = None        # no stacking without it
+try :
+    from PIL import Image
+except ImportError :
+    Image = None
+
+################################################################################
+# -- stacker class; merges a burst of raw frames into one JPEG
+################################################################################
+
+class stacker :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 23:48:05 $"
+
+    # -- frames are taken as RGB, which picamera pads to 32x16 blocks;
+    # -- clip works through a frame STRIP rows at a time
+
+    STRIP = 16
+
+    def __init__ (self, resolution, frames, method='mean', sigma=3.0, quality=85) :
+
+        # -- frames of resolution are merged frames at a time.  mean
+        # -- averages them; clip puts the running mean in place of values
+        # -- more than sigma times the frame's noise from it, so a passing
+        # -- headlight or a hot pixel doesn't streak the frame.  Every
+        # -- buffer is allocated here, so memory is the same for 4 frames
+        # -- as for 200, and the same for clip as for mean: the capture
+        # -- buffer and a 16 bit sum, 3 bytes a padded pixel channel (45MB
+        # -- at 2592x1952), and for clip a strip of temporaries.  PIL's
+        # -- JPEG encoder needs a little more in finish().
+
+        if numpy is None :
+            raise ImportError ("stacker needs numpy")
+        if Image is None :
+            raise ImportError ("stacker needs PIL")
+        if frames < 1 or frames > 255 :
+            raise ValueError ("stacks are 1 to 255 frames")     # 16 bit sum
+        w, h = [int (v) for v in str (resolution).split ('x')]
+        self.size = (w, h)
+        self.padded = ((w + 31) // 32 * 32, (h + 15) // 16 * 16)
+        self.frames = frames
+        self.method = method
+        self.sigma = sigma
+        self.quality = quality
+        shape = (self.padded[1], self.padded[0], 3)
+        self.raw = bytearray (shape[0] * shape[1] * 3)
+        self.x = numpy.frombuffer (self.raw, dtype=numpy.uint8).reshape (shape)
+        self.sum = numpy.zeros (shape, dtype=numpy.uint16)
+        if method == 'clip' :
+            strip = (min (self.STRIP, shape[0]), shape[1], 3)
+            self.mean = numpy.zeros (strip, dtype=numpy.uint16)
+            self.diff = numpy.zeros (strip, dtype=numpy.int16)
+            self.mask = numpy.zeros (strip, dtype=bool)
+        self.n = 0
+        self.took = 0.0         # merging time of the last stack, seconds
+        self.stacks = 0
+        self.added = 0
+        self.kept = 0           # pixel values clip let through
+        self.tsum = 0.0
+        self.tmax = 0.0
+
+    def buffer (self) :
+
+        # -- what the camera captures the next frame into
+        return self.raw
+
+    def start (self) :
+
+        self.n = 0
+        self.took = 0.0
+
+    def add (self) :
+
+        # -- fold the frame in buffer() into the stack
+
+        t0 = time.time ()
+        x = self.x
+        if self.method != 'clip' :
+            numpy.add (self.sum, x, out=self.sum, casting='unsafe')
+        elif self.n == 0 :
+            self.sum[...] = x
+            self.kept += x.size
+        else :
+            # -- the frame's noise from a sample of its distance to the
+            # -- running mean, then the frame in strips against that
+            sample = (x.ravel ()[::61].astype (numpy.float32) -
+                      self.sum.ravel ()[::61] // self.n)
+            noise = max (2.0, float (numpy.sqrt (numpy.mean (sample * sample))))
+            limit = self.sigma * noise
+            for top in range (0, x.shape[0], self.STRIP) :
+                xs = x[top:top + self.STRIP]
+                ss = self.sum[top:top + self.STRIP]
+                rows = xs.shape[0]
+                mean, diff, mask = self.mean[:rows], self.diff[:rows], self.mask[:rows]
+                numpy.floor_divide (ss, self.n, out=mean)
+                numpy.subtract (xs, mean, out=diff, dtype=numpy.int16, casting='unsafe')
+                numpy.add (ss, xs, out=ss, casting='unsafe')
+                # -- what is off by more than limit goes back out, which
+                # -- leaves the mean in its place: sum + x - (x - mean)
+                numpy.abs (diff, out=mean, casting='unsafe')
+                numpy.greater (mean, limit, out=mask)
+                numpy.subtract (ss, diff, out=ss, where=mask, casting='unsafe')
+                self.kept += mask.size - int (numpy.count_nonzero (mask))
+        self.n += 1
+        self.added += 1
+        self.took += time.time () - t0
+
+    def finish (self, out) :
+
+        # -- write the merged frame to out as a JPEG; the capture buffer
+        # -- holds the result, so nothing more is allocated than PIL needs
+
+        t0 = time.time ()
+        numpy.floor_divide (self.sum, max (1, self.n), out=self.x, casting='unsafe')
+        self.sum.fill (0)
+        im = Image.frombuffer ('RGB', self.padded, self.raw, 'raw', 'RGB', 0, 1)
+        if self.padded != self.size :
+            im = im.crop ((0, 0, self.size[0], self.size[1]))
+        im.save (out, 'JPEG', quality=self.quality)
+        self.took += time.time () - t0
+        self.stacks += 1
+        self.tsum += self.took
+        if self.took > self.tmax :
+            self.tmax = self.took
+
+    def stats (self) :
+        s = "stacks=%d frames=%d avg=%0.1fms max=%0.1fms" % (
+            self.stacks, self.added,
+            self.tsum * 1000 / max (1, self.stacks), self.tmax * 1000)
+        if self.method == 'clip' and self.added :
+            s += " kept=%0.1f%%" % (self.kept * 100.0 / (self.added * self.x.size))
+        return s
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import threading
+from collections import deque
+
+################################################################################
+# -- storemon class; free space sampled in the background, and a forecast
+################################################################################
+
+class storemon :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 13:30:52 $"
+
+    def __init__ (self, path, period=30.0, reserve=64*1024*1024, window=50) :
+
+        # -- path is sampled with statvfs every period seconds.  reserve
+        # -- bytes are kept back for the OS and for finishing the mp4.
+        # -- JPEG sizes are averaged over the last window frames of each
+        # -- resolution.
+
+        self.path = path
+        self.period = period
+        self.reserve = reserve
+        self.window = window
+        self.sizes = {}         # resolution -> deque of recent frame sizes
+        self.sampled = 0        # free bytes at the last statvfs
+        self.since = 0          # bytes written since then
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.running = False
+        self.sample()
+
+    def sample (self) :
+
+        try :
+            dstat = os.statvfs(self.path)
+        except OSError :
+            return
+        with self.lock :
+            self.sampled = dstat.f_bsize * dstat.f_bavail
+            self.since = 0
+            self.samples += 1
+
+    def _run (self) :
+
+        while self.running :
+            self.wake.wait(self.period)
+            self.wake.clear()
+            if self.running :
+                self.sample()
+
+    def start (self) :
+
+        if self.thread is not None :
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="storemon")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def kick (self) :
+
+        # -- sample now rather than at the end of the period
+        self.wake.set()
+
+    def stop (self) :
+
+        self.running = False
+        self.wake.set()
+        if self.thread is not None :
+            self.thread.join()
+        self.thread = None
+
+    def frame (self, resolution, nbytes) :
+
+        # -- note a frame just written
+
+        with self.lock :
+            self.since += nbytes
+            if resolution not in self.sizes :
+                self.sizes[resolution] = deque(maxlen=self.window)
+            self.sizes[resolution].append(nbytes)
+
+    def free (self) :
+
+        # -- last sample less what has been written since
+        with self.lock :
+            return max(0, self.sampled - self.since)
+
+    def avgsize (self, resolution) :
+
+        # -- mean JPEG size at resolution; a guess until frames come in
+
+        sizes = self.sizes.get(resolution)
+        if sizes :
+            return sum(sizes) / float(len(sizes))
+        w, h = str(resolution).split('x')
+        return int(w) * int(h) * 0.25
+
+    def frames_left (self, resolution) :
+        return max(0, int((self.free() - self.reserve) / self.avgsize(resolution)))
+
+    def time_left (self, resolution, interval) :
+        return self.frames_left(resolution) * interval
+
+    def full (self, resolution) :
+
+        # -- no room for another frame without eating into the reserve
+        return self.frames_left(resolution) < 1
@@ -28,6 +28,7 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #------------------------------------------------------------------------
 
+from __future__ import print_function
 
 ################################################################################
 # -- submenu class; each instance is one set of related selections
@@ -181,37 +182,37 @@ if __name__ == "__main__" :
     # -- Exercise the menus
     ################################################################################
 
-    print cycle.VERSION+"\n"
+    print (cycle.VERSION+"\n")
 
     for menu in menus :
-        print menu.name
+        print (menu.name)
         for ix in range (0, menu.count) :
             prompt, val = menu.whichat (ix)
-            print "\t", prompt,
+            print ("\t" + prompt, end="")
             if ix == menu.selection :
-                print "*"
+                print (" *")
             else :
-                print
+                print ()
 
 
-    print "\nCycle FPS:\n"
+    print ("\nCycle FPS:\n")
 
     for ix in range (0, fps.count) :
         prompt, val = fps.selnext()
-        print prompt
+        print (prompt)
 
-    print "\nCurrent Values:\n"
+    print ("\nCurrent Values:\n")
 
-    print "--------------------------------"
+    print ("--------------------------------")
     for menu in menus :
         prompt, value = menu.current()
-        print "%s: %s" % (menu.name, prompt)
-    print "--------------------------------"
+        print ("%s: %s" % (menu.name, prompt))
+    print ("--------------------------------")
         
-    print "\nIncrement reclen\n"
+    print ("\nIncrement reclen\n")
 
     prompt, value = reclen.selnext()
-    print prompt
+    print (prompt)
 
-    print "\nreclen prompts\n"
-    print reclen.prompts
+    print ("\nreclen prompts\n")
+    print (reclen.prompts)
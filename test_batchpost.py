@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Tests of batchpost.py picking up after an interrupted run.  Needs PIL.
+
+import os, shutil, tempfile, unittest
+
+import batchpost
+
+# --
+
+class resume (unittest.TestCase) :
+
+    FRAMES = 6
+
+    def setUp (self) :
+
+        self.root = tempfile.mkdtemp()
+        self.d = os.path.join(self.root, "D0001")
+        os.makedirs(self.d)
+        for i in range(0, self.FRAMES) :
+            im = batchpost.Image.new('RGB', (320, 240), (i * 40, 80, 120))
+            im.save(os.path.join(self.d, "F%05dT120000.jpg" % i), 'JPEG')
+
+    def tearDown (self) :
+        shutil.rmtree(self.root)
+
+    def sizes (self) :
+        out = os.path.join(self.d, "post")
+        return [batchpost.Image.open(os.path.join(out, f)).size
+                for f in sorted(os.listdir(out)) if f.endswith(".jpg")]
+
+    def interrupt (self, spec, done) :
+
+        # -- what run() gets through before it is killed after done frames
+
+        chain = batchpost.parse_chain(spec)
+        frames = batchpost.plan([self.d], "post", chain, spec)
+        for src, dst, todo in frames[:done] :
+            batchpost.work((src, dst, chain))
+
+    def test_rerun (self) :
+
+        spec = "resize=160x120"
+        self.assertEqual(batchpost.run([self.d], batchpost.parse_chain(spec), spec, jobs=1),
+                         self.FRAMES)
+        self.assertEqual(batchpost.run([self.d], batchpost.parse_chain(spec), spec, jobs=1), 0)
+
+    def test_changed_chain_interrupted (self) :
+
+        old = "resize=160x120"
+        new = "resize=80x60"
+        batchpost.run([self.d], batchpost.parse_chain(old), old, jobs=1)
+        self.interrupt(new, 2)
+        # -- every frame is redone, not only the ones the old chain made
+        self.assertEqual(batchpost.run([self.d], batchpost.parse_chain(new), new, jobs=1),
+                         self.FRAMES)
+        self.assertEqual(self.sizes(), [(80, 60)] * self.FRAMES)
+
+    def test_back_to_old_chain (self) :
+
+        old = "resize=160x120"
+        new = "resize=80x60"
+        batchpost.run([self.d], batchpost.parse_chain(old), old, jobs=1)
+        self.interrupt(new, 2)
+        self.assertEqual(batchpost.run([self.d], batchpost.parse_chain(old), old, jobs=1),
+                         self.FRAMES)
+        self.assertEqual(self.sizes(), [(160, 120)] * self.FRAMES)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Tests of the status block the forked engine publishes to the UI.
+
+import os, sys, shutil, tempfile, unittest
+
+import pilapse
+from engine import statusblock, WHY
+from hwsim import simhw
+from benchloop import NullSink
+
+# --
+
+class status (unittest.TestCase) :
+
+    def setUp (self) :
+
+        # -- an engine that has recorded a few frames on simulated hardware
+
+        self.root = tempfile.mkdtemp()
+        self.stdout = sys.stdout
+        sys.stdout = NullSink()
+        pilapse.hw = simhw(0.01)
+        pilapse.set_lapsdir(self.root)
+        pilapse.ENCODER = "sh -c 'cat > /dev/null'"
+        pilapse.engine_init()
+        pilapse.engine_command('start', pilapse.settings())
+        while pilapse.framecount < 3 :
+            pilapse.hw.wait(pilapse.engine_step() - pilapse.hw.monotonic())
+
+    def tearDown (self) :
+
+        pilapse.engine_stop()
+        sys.stdout = self.stdout
+        shutil.rmtree(self.root, True)
+
+    def same (self, got, want) :
+
+        self.assertEqual(sorted(got), sorted(statusblock.FIELDS))
+        for k in statusblock.FIELDS :
+            if isinstance(want[k], float) :
+                # -- most figures go through single precision
+                self.assertAlmostEqual(got[k], want[k], places=3, msg=k)
+            else :
+                self.assertEqual(got[k], want[k], k)
+
+    def test_roundtrip (self) :
+
+        st = pilapse.engine_status()
+        self.assertEqual(st['recording'], 1)
+        block = statusblock()
+        block.write(st)
+        self.same(block.read(), st)
+
+    def test_forked (self) :
+
+        # -- what a child writes, the parent reads
+        st = pilapse.engine_status()
+        block = statusblock()
+        pid = os.fork()
+        if pid == 0 :
+            block.write(st)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.same(block.read(lambda : False), st)
+
+    def test_torn (self) :
+
+        # -- an engine that died part way through a write leaves the
+        # -- reader its last good copy rather than a hang
+        st = pilapse.engine_status()
+        block = statusblock()
+        block.write(st)
+        block.read()
+        block.map[0:4] = block.SEQ.pack(block.seq + 1)
+        block.map[8:12] = b'\xff' * 4
+        self.same(block.read(lambda : False), st)
+        self.assertIn(st['why'], WHY)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+    unittest.main()
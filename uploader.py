@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+#-- Reads the event stream from pilapse.py on stdin and ships the frames to
+#-- a collector (collector.py, or anything that speaks the same protocol)
+#-- in tar bundles over one TCP connection.
+#--
+#-- Every frame event is given the next number in a spool journal on the
+#-- card before anything else happens, so the pipe from pilapse.py is
+#-- always drained at once and the writer thread never waits on us.  The
+#-- collector acknowledges each bundle with the number of its last frame;
+#-- that number is kept in a state file, and on a reconnect the collector
+#-- says how far it has got, so sending picks up where it stopped rather
+#-- than scanning the card again.  Bandwidth is held to a byte rate, and
+#-- a lost connection is retried with backoff.
+#--
+#-- Protocol: one JSON line each way to start, {"unit", "v"} then
+#-- {"have"}; then for each bundle a JSON line {"bundle", "first",
+#-- "frames", "size"} followed by size bytes of tar, answered by a line
+#-- {"ack"} once the collector has it on disk.
+
+import sys, os, io, json, time, errno, select, socket, tarfile, getopt
+import collections, itertools
+
+import events
+import segstore
+
+PORT = 5123             # collector port
+SPOOL = "upload.spool"  # frame events not yet acknowledged, one per line
+STATE = "upload.state"  # numbers acknowledged and given out so far
+
+# --
+
+def message (fields) :
+    return (json.dumps (fields, sort_keys=True) + "\n").encode ('utf-8')
+
+################################################################################
+# -- uploader class; the spool, the connection and the bundles
+################################################################################
+
+class uploader :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 22:20:31 $"
+
+    window = 2          # bundles sent but not yet acknowledged
+    backoff_max = 60.0  # longest wait between connection attempts
+
+    def __init__ (self, spooldir, host, port=PORT, unit=None, rate=0, batch=32, level=1) :
+
+        # -- rate is bytes a second, 0 for no limit; batch is frames in a
+        # -- bundle and level the gzip level, 0 for a plain tar.  JPEG
+        # -- hardly compresses, so level 1 is as far as it is worth going.
+
+        self.spool = os.path.join(spooldir, SPOOL)
+        self.statefile = os.path.join(spooldir, STATE)
+        self.host = host
+        self.port = port
+        self.unit = unit or socket.gethostname()
+        self.rate = rate
+        self.batch = batch
+        self.level = level
+        self.sock = None
+        self.inbuf = b''
+        self.out = b''          # bytes of bundles waiting to go
+        self.inflight = 0
+        self.retry_at = 0
+        self.backoff = 1.0
+        self.tokens = 0
+        self.refilled = time.time()
+        self.frames = 0
+        self.bundles = 0
+        self.sentbytes = 0
+        self.missing = 0        # frames gone from the card before they went
+        self.reconnects = 0
+
+        state = {}
+        try :
+            fh = open(self.statefile)
+            state = json.load(fh)
+            fh.close()
+        except (IOError, OSError, ValueError) :
+            pass
+        self.acked = state.get('acked', 0)      # last number acknowledged
+        self.next = state.get('next', 1)        # next number to give out
+        # -- only the numbers and their offsets in the spool are kept in
+        # -- memory; a bundle reads its events back from the card
+        self.queue = collections.deque()        # (number, offset) not acked
+        self.unsent = 0                         # queue index past self.sent
+        end = 0
+        try :
+            fh = open(self.spool, 'rb')
+            while True :
+                line = fh.readline()
+                if not line.endswith(b'\n') :
+                    break       # torn last line after a power cut
+                try :
+                    q = json.loads(line.decode('utf-8'))['q']
+                except (ValueError, KeyError) :
+                    end += len(line)
+                    continue
+                if q > self.acked :
+                    self.queue.append((q, end))
+                self.next = max(self.next, q + 1)
+                end += len(line)
+            fh.close()
+        except (IOError, OSError) :
+            pass
+        self.sent = self.acked                  # last number in a bundle
+        self.journal = open(self.spool, 'ab')
+        self.journal.truncate(end)              # drop the torn line, if any
+        self.jend = end
+        self.reader = open(self.spool, 'rb')
+
+    def take (self, ev) :
+
+        # -- spool a frame event under the next number
+
+        q = self.next
+        self.next += 1
+        line = (json.dumps({ 'q' : q, 'ev' : ev }, sort_keys=True) + "\n").encode('utf-8')
+        self.journal.write(line)
+        self.journal.flush()
+        self.queue.append((q, self.jend))
+        self.jend += len(line)
+
+    def _save (self) :
+
+        tmp = self.statefile + ".tmp"
+        fh = open(tmp, 'w')
+        json.dump({ 'acked' : self.acked, 'next' : self.next }, fh)
+        fh.close()
+        os.rename(tmp, self.statefile)
+
+    def ack (self, q) :
+
+        # -- the collector has everything up to q
+
+        if q <= self.acked :
+            return
+        self.acked = q
+        while self.queue and self.queue[0][0] <= q :
+            self.queue.popleft()
+            self.frames += 1
+            if self.unsent :
+                self.unsent -= 1
+        self._save()
+        if not self.queue :
+            # -- nothing left to resend; start the journal afresh
+            self.journal.close()
+            self.journal = open(self.spool, 'wb')
+            self.jend = 0
+            self.reader.close()     # its buffer holds the old journal
+            self.reader = open(self.spool, 'rb')
+
+    def _event (self, offset) :
+
+        # -- the frame event spooled at offset
+
+        self.reader.seek(offset)
+        return json.loads(self.reader.readline().decode('utf-8'))['ev']
+
+    def _read (self, ev) :
+
+        # -- (name in the bundle, JPEG bytes), or None if it is gone
+
+        name = "D%0.4d/%s" % (ev.get('n', 0), os.path.basename(ev['path']))
+        try :
+            if 'seg' in ev :
+                return name, segstore.readat(ev['seg'], ev['offset'])[1]
+            fh = open(ev['path'], 'rb')
+            data = fh.read()
+            fh.close()
+            return name, data
+        except (IOError, OSError, ValueError) :
+            return None
+
+    def bundle (self) :
+
+        # -- the next batch of frames as header line and tar, or None
+
+        todo = list(itertools.islice(self.queue, self.unsent, self.unsent + self.batch))
+        if not todo :
+            return None
+        buf = io.BytesIO()
+        if self.level :
+            tar = tarfile.open(fileobj=buf, mode='w:gz', compresslevel=self.level)
+        else :
+            tar = tarfile.open(fileobj=buf, mode='w')
+        count = 0
+        for q, offset in todo :
+            ev = self._event(offset)
+            got = self._read(ev)
+            if got is None :
+                self.missing += 1
+                continue
+            info = tarfile.TarInfo(got[0])
+            info.size = len(got[1])
+            info.mtime = int(ev.get('t', time.time()))
+            tar.addfile(info, io.BytesIO(got[1]))
+            count += 1
+        tar.close()
+        payload = buf.getvalue()
+        self.sent = todo[-1][0]
+        self.unsent += len(todo)
+        self.bundles += 1
+        return message({ 'bundle' : self.sent, 'first' : todo[0][0],
+                         'frames' : count, 'size' : len(payload) }) + payload
+
+    def connect (self) :
+
+        # -- connect and agree where to carry on from
+
+        self.sock = socket.create_connection((self.host, self.port), 10)
+        self.sock.sendall(message({ 'unit' : self.unit, 'v' : 1 }))
+        reply = b''
+        while not reply.endswith(b'\n') :
+            chunk = self.sock.recv(4096)
+            if not chunk :
+                raise socket.error(errno.ECONNRESET, "collector hung up")
+            reply += chunk
+        have = json.loads(reply.decode('utf-8')).get('have', 0)
+        if have >= self.next :
+            # -- it has numbers we never gave out; another spool's
+            raise ValueError("collector has %d of %s, spool is at %d" % (have, self.unit, self.next - 1))
+        self.ack(have)
+        self.sock.setblocking(False)
+        self.inbuf = b''
+        self.out = b''
+        self.inflight = 0
+        self.sent = self.acked
+        self.unsent = 0
+        self.backoff = 1.0
+        self.reconnects += 1
+
+    def drop (self, why) :
+
+        # -- lose the connection; whatever was not acknowledged goes again
+
+        sys.stderr.write("uploader: %s; retry in %ds\n" % (why, self.backoff))
+        if self.sock is not None :
+            self.sock.close()
+        self.sock = None
+        self.retry_at = time.time() + self.backoff
+        self.backoff = min(self.backoff * 2, self.backoff_max)
+
+    def _refill (self, now) :
+
+        if self.rate :
+            self.tokens = min(max(self.rate, 65536), self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def _send (self, now) :
+
+        self._refill(now)
+        size = len(self.out)
+        if self.rate :
+            size = min(size, int(self.tokens))
+        if size <= 0 :
+            return
+        try :
+            n = self.sock.send(self.out[0:size])
+        except socket.error as e :
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK) :
+                return
+            raise
+        self.out = self.out[n:]
+        self.sentbytes += n
+        if self.rate :
+            self.tokens -= n
+
+    def _recv (self) :
+
+        chunk = self.sock.recv(4096)
+        if not chunk :
+            raise socket.error(errno.ECONNRESET, "collector hung up")
+        self.inbuf += chunk
+        lines = self.inbuf.split(b'\n')
+        self.inbuf = lines.pop()
+        for line in lines :
+            self.ack(json.loads(line.decode('utf-8'))['ack'])
+            self.inflight -= 1
+
+    def run (self, fd) :
+
+        # -- until end of file on fd and everything acknowledged
+
+        pending = b''
+        while fd is not None or self.queue :
+            now = time.time()
+            if self.sock is None and self.queue and now >= self.retry_at :
+                try :
+                    self.connect()
+                except (socket.error, ValueError) as e :
+                    self.drop(e)
+            if self.sock is not None and not self.out and self.inflight < self.window :
+                b = self.bundle()
+                if b is not None :
+                    self.out = b
+                    self.inflight += 1
+
+            rlist = [fd] if fd is not None else []
+            wlist = []
+            timeout = None
+            if self.sock is not None :
+                rlist.append(self.sock)
+                if self.out :
+                    self._refill(now)
+                    if not self.rate or self.tokens >= 1 :
+                        wlist.append(self.sock)
+                    else :
+                        timeout = (1 - self.tokens) / float(self.rate)
+            elif self.queue :
+                timeout = max(0, self.retry_at - now)
+
+            r, w, x = select.select(rlist, wlist, [], timeout)
+            try :
+                if self.sock is not None and self.sock in r :
+                    self._recv()
+                if self.sock is not None and self.sock in w :
+                    self._send(time.time())
+            except (socket.error, ValueError, KeyError) as e :
+                self.drop(e)
+
+            if fd is not None and fd in r :
+                chunk = os.read(fd, 65536)
+                if not chunk :
+                    fd = None
+                    continue
+                pending += chunk
+                lines = pending.split(b'\n')
+                pending = lines.pop()
+                for line in lines :
+                    ev = events.decode(line.decode('utf-8', 'replace').strip())
+                    if ev is not None and ev['ev'] == 'frame' :
+                        self.take(ev)
+
+    def close (self) :
+
+        self.journal.close()
+        self.reader.close()
+        if self.sock is not None :
+            self.sock.close()
+        self.sock = None
+
+    def stats (self) :
+        return "frames=%d bundles=%d bytes=%d missing=%d connects=%d waiting=%d" % (
+            self.frames, self.bundles, self.sentbytes, self.missing,
+            self.reconnects, len(self.queue))
+
+# --
+
+def usage () :
+    sys.stderr.write ("Usage: %s -c host[:port] [-d spooldir] [-u unit] [-b KB/s] [-n frames] [-z level]\n" % sys.argv[0])
+    sys.stderr.write ("    reads pilapse.py events on stdin; runs at the lowest CPU priority\n")
+    sys.exit (1)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__" :
+
+    spooldir = "/var/lapse"
+    host = None
+    port = PORT
+    unit = None
+    rate = 0
+    batch = 32
+    level = 1
+    try :
+        opts, args = getopt.getopt (sys.argv[1:], "c:d:u:b:n:z:")
+    except getopt.GetoptError :
+        usage ()
+    for o, a in opts :
+        if o == '-c' :
+            host, sep, p = a.partition (':')
+            if p :
+                port = int (p)
+        elif o == '-d' :
+            spooldir = a
+        elif o == '-u' :
+            unit = a
+        elif o == '-b' :
+            rate = int (float (a) * 1024)
+        elif o == '-n' :
+            batch = max (1, int (a))
+        elif o == '-z' :
+            level = int (a)
+    if host is None :
+        usage ()
+
+    if not os.path.isdir (spooldir) :
+        sys.stderr.write ("%s: No such directory\n" % spooldir)
+        sys.exit (1)
+
+    # -- capture comes first; this gets what CPU is left over
+    os.nice (19)
+
+    up = uploader (spooldir, host, port, unit, rate, batch, level)
+    try :
+        up.run (sys.stdin.fileno ())
+    except KeyboardInterrupt :
+        pass
+    up.close ()
+    sys.stderr.write ("uploader %s\n" % up.stats ())
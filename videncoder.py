@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+# :set ts=4 sw=4 expandtab
+#------------------------------------------------------------------------
+# Copyright (c) 2019, EGB13.net
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The names of its contributors may not be used to endorse or promote
+#       products derived from this software without specific prior
+#       written permission.
+#
+# THIS SOFTWARE IS PROVIDED ''AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES,
+# INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY
+# AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL
+# THE COPYRIGHT HOLDER BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED
+# TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import shlex
+import threading
+import subprocess
+
+try :
+    import queue
+except ImportError :
+    import Queue as queue       # python 2
+
+################################################################################
+# -- videncoder class; an encoder subprocess fed JPEG bytes on its stdin
+################################################################################
+
+class videncoder :
+
+    VERSION = "$Revision: 1.1 $ $Date: 2026/10/18 15:22:37 $"
+
+    def __init__ (self, command, vidpath, fps, depth=8, threaded=True, flicker=None, clock=None) :
+
+        # -- command is a shell-style string; {vidpath} and {fps} in it
+        # -- are filled in.  At most depth frames wait for the encoder;
+        # -- feed() blocks beyond that, which backs up into the writer.
+        # -- A deflicker given as flicker corrects the frames on the way,
+        # -- and a clockface given as clock stamps them, on the encoder's
+        # -- thread.
+
+        argv = [a.format(vidpath=vidpath, fps=fps) for a in shlex.split(command)]
+        self.vidpath = vidpath
+        # -- stdout is pilapse.py's event stream; keep the encoder off it
+        self.devnull = open(os.devnull, 'wb')
+        self.proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=self.devnull)
+        self.threaded = threaded
+        self.flicker = flicker
+        self.clock = clock
+        self.frames = 0
+        self.nbytes = 0
+        self.broken = False
+        self.bad = 0            # frames dropped on an error in the overlays
+        self.started = time.time()
+        self.done = threading.Event()
+        self.jobs = queue.Queue(depth)
+        self.thread = None
+        if threaded :
+            self.thread = threading.Thread(target=self._run, name="videncoder")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def feed (self, data, t=None) :
+
+        # -- data must not change after this; pass a copy of a reused buffer.
+        # -- t is when the frame was taken, for the clock overlay.
+
+        if self.threaded :
+            self.jobs.put((data, t))
+        else :
+            self._guard(data, t)
+
+    def _guard (self, data, t) :
+
+        # -- a frame PIL cannot read is dropped, and the encoder goes on
+        # -- taking jobs, so feed() and finish() never wait on a dead thread
+
+        try :
+            self._take(data, t)
+        except Exception as e :
+            sys.stderr.write("videncoder: %s: dropped frame: %s\n" % (self.vidpath, e))
+            self.bad += 1
+
+    def _take (self, data, t) :
+
+        if self.flicker is None :
+            self._stamp(data, t)
+            return
+        for frame, tf in self.flicker.push(data, t) :
+            self._stamp(frame, tf)
+
+    def _stamp (self, data, t) :
+
+        if self.clock is not None and t is not None :
+            data = self.clock.stamp(data, t)
+        self._write(data)
+
+    def _write (self, data) :
+
+        if self.broken :
+            return
+        try :
+            self.proc.stdin.write(data)
+            self.frames += 1
+            self.nbytes += len(data)
+        except (IOError, OSError) as e :
+            # -- the encoder died; keep the frames coming to the card
+            sys.stderr.write("videncoder: %s: %s\n" % (self.vidpath, e))
+            self.broken = True
+
+    def _close (self) :
+
+        try :
+            if self.flicker is not None :
+                for frame, t in self.flicker.flush() :
+                    self._stamp(frame, t)
+        except Exception as e :
+            sys.stderr.write("videncoder: %s: flush: %s\n" % (self.vidpath, e))
+        try :
+            self.proc.stdin.close()
+        except (IOError, OSError) :
+            pass
+        self.proc.wait()
+        self.devnull.close()
+        self.done.set()
+
+    def _run (self) :
+
+        while True :
+            job = self.jobs.get()
+            if job is None :
+                break
+            self._guard(*job)
+        self._close()
+
+    def finish (self, wait=False) :
+
+        # -- no more frames; the encoder finishes the file in the background
+        # -- unless wait is set
+
+        if self.threaded :
+            self.jobs.put(None)
+        else :
+            self._close()
+        if wait :
+            self.done.wait()
+
+    def finished (self) :
+        return self.done.is_set()
+
+    def wait (self) :
+        self.done.wait()
+
+    def stats (self) :
+
+        dt = max(1e-6, time.time() - self.started)
+        text = "frames=%d bytes=%d fed %0.1f fps" % (self.frames, self.nbytes, self.frames / dt)
+        if self.bad :
+            text += " bad=%d" % self.bad
+        if self.flicker is not None :
+            text += " deflicker " + self.flicker.stats()
+        if self.clock is not None :
+            text += " clock " + self.clock.stats()
+        return text